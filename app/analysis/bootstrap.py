@@ -0,0 +1,74 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+def _batched_r(x, y):
+    """
+    Pearson r of many resamples at once.
+    :param x: Array of shape (B, n).
+    :param y: Array of shape (B, n, m).
+    :return: Array of shape (B, m), NaN where a resample has no variance.
+    """
+    dx = x - x.mean(axis=1, keepdims=True)
+    dy = y - y.mean(axis=1, keepdims=True)
+    sxy = np.einsum('bn,bnm->bm', dx, dy)
+    sxx = np.einsum('bn,bn->b', dx, dx)[:, None]
+    syy = np.einsum('bnm,bnm->bm', dy, dy)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sxy / np.sqrt(sxx * syy)
+
+def _resample_batch(x, y, size, seed, kind):
+    """Correlations of one batch of bootstrap resamples or permutations."""
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    if kind == 'bootstrap':
+        rows = rng.integers(0, n, size=(size, n))
+        return _batched_r(x[rows], y[rows])
+    rows = rng.permuted(np.broadcast_to(np.arange(n), (size, n)), axis=1)
+    return _batched_r(x[rows], np.broadcast_to(y, (size,) + y.shape))
+
+def _resample(x, y, n_resamples, seed, kind, batch_size, workers):
+    """Run n_resamples in batches, in this process or on a process pool, and stack the correlations."""
+    sizes = [batch_size] * (n_resamples // batch_size) + ([n_resamples % batch_size] if n_resamples % batch_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            batches = list(pool.map(_resample_batch, [x] * len(sizes), [y] * len(sizes), sizes, seeds,
+                                    [kind] * len(sizes)))
+    else:
+        batches = [_resample_batch(x, y, size, s, kind) for size, s in zip(sizes, seeds)]
+    return np.concatenate(batches)
+
+def correlation_uncertainty(x, y, n_resamples=10000, confidence=0.95, seed=0, batch_size=2000, workers=None):
+    """
+    Bootstrap confidence intervals and permutation p-values for the correlation of x with every column of y.
+    Resamples are drawn batch_size at a time and evaluated as one array operation per batch.
+    Rows with a missing value in x or any column of y are left out.
+    :param x: Series or array of shape (n,).
+    :param y: DataFrame of shape (n, m).
+    :param n_resamples: Number of bootstrap resamples, and of permutations.
+    :param confidence: Confidence level of the percentile intervals.
+    :param seed: Seed of the random generator, so results are reproducible.
+    :param batch_size: Resamples evaluated per array operation.
+    :param workers: Number of worker processes. None runs every batch in this process.
+    :return: DataFrame indexed by the columns of y with r, ci_low, ci_high and perm_p_value.
+    """
+    x = np.asarray(x, dtype=float)
+    values = y.to_numpy(dtype=float)
+    complete = ~(np.isnan(x) | np.isnan(values).any(axis=1))
+    x, values = x[complete], values[complete]
+
+    observed = _batched_r(x[None, :], values[None, :, :])[0]
+    boot = _resample(x, values, n_resamples, seed, 'bootstrap', batch_size, workers)
+    perm = _resample(x, values, n_resamples, seed + 1, 'permutation', batch_size, workers)
+
+    alpha = (1 - confidence) / 2
+    ci_low, ci_high = np.nanquantile(boot, [alpha, 1 - alpha], axis=0)
+    # The observed statistic counts as one permutation, so p is never 0
+    extreme = (np.abs(perm) >= np.abs(observed) - 1e-12).sum(axis=0)
+    return pd.DataFrame({
+        'r': observed,
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+        'perm_p_value': (extreme + 1) / (n_resamples + 1),
+    }, index=y.columns)
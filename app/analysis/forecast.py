@@ -0,0 +1,114 @@
+import os
+import time
+import logging
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from app.config import FORECAST_HORIZON, FORECAST_WORKERS, REDUCTION_TARGET
+
+# Series shorter than this are projected flat from their last value instead of fitted
+MIN_FIT_YEARS = 10
+
+STATEWIDE = 'Maryland (statewide)'
+
+logger = logging.getLogger(__name__)
+
+def _fit_one(series, end_year, alpha):
+    """
+    Fit a damped-trend ETS model to one yearly series and project it to end_year.
+    :param series: Series of values indexed by consecutive years.
+    :return: DataFrame indexed by Year with Forecast, Lower and Upper.
+    """
+    from statsmodels.tsa.exponential_smoothing.ets import ETSModel
+
+    steps = end_year - int(series.index[-1])
+    years = pd.RangeIndex(int(series.index[-1]) + 1, end_year + 1, name='Year')
+    if len(series) < MIN_FIT_YEARS:
+        last = float(series.iloc[-1])
+        return pd.DataFrame({'Forecast': last, 'Lower': np.nan, 'Upper': np.nan}, index=years)
+    endog = pd.Series(series.to_numpy(dtype=float),
+                      index=pd.period_range(start=str(int(series.index[0])), periods=len(series), freq='Y'))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        fit = ETSModel(endog, error='add', trend='add', damped_trend=True).fit(disp=False)
+        frame = fit.get_prediction(start=len(endog), end=len(endog) + steps - 1).summary_frame(alpha=alpha)
+    return pd.DataFrame({'Forecast': frame['mean'].to_numpy(),
+                         'Lower': frame['pi_lower'].to_numpy(),
+                         'Upper': frame['pi_upper'].to_numpy()}, index=years)
+
+def _fit_batch(batch, end_year, alpha):
+    """Fit a batch of (key, series) pairs in one worker process."""
+    return [(key, _fit_one(series, end_year, alpha)) for key, series in batch]
+
+def forecast_series(series, end_year, alpha=0.05, workers=FORECAST_WORKERS):
+    """
+    Project many yearly series with damped-trend ETS models across a process pool.
+    Interior missing years are interpolated and leading or trailing gaps dropped before fitting.
+    :param series: Dictionary of key to Series indexed by Year.
+    :param end_year: Last year to project to.
+    :param alpha: Significance level of the prediction intervals.
+    :param workers: Number of worker processes. None uses one per CPU, 1 fits in this process.
+    :return: Dictionary of key to DataFrame indexed by Year with Forecast, Lower and Upper.
+    """
+    prepared = []
+    for key, values in series.items():
+        values = values.dropna()
+        if len(values):
+            # Every year from the first to the last observation, so the fit sees the real timeline
+            values = values.reindex(pd.RangeIndex(int(values.index[0]), int(values.index[-1]) + 1, name='Year'))
+            values = values.interpolate(limit_area='inside')
+        if len(values) and int(values.index[-1]) < end_year:
+            prepared.append((key, values))
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1 or len(prepared) < 2:
+        results = _fit_batch(prepared, end_year, alpha)
+    else:
+        # One strided batch per worker keeps the start-up and pickling overhead per process constant
+        batches = [prepared[i::workers] for i in range(workers) if prepared[i::workers]]
+        with ProcessPoolExecutor(max_workers=len(batches)) as pool:
+            results = [item for batch in pool.map(_fit_batch, batches, [end_year] * len(batches),
+                                                  [alpha] * len(batches)) for item in batch]
+    logger.info("Fitted %s series with %s workers in %.2fs", len(prepared), workers, time.perf_counter() - start)
+    return dict(results)
+
+def reduction_forecast(cube, metric, horizon=FORECAST_HORIZON, target=REDUCTION_TARGET, workers=FORECAST_WORKERS):
+    """
+    Project a crime rate for every jurisdiction and the state, and compare it with a reduction path.
+    The path falls linearly from each series' last observed value to (1 - target) times that value at the
+    horizon. Forecasts and intervals are clipped at zero since rates cannot be negative.
+    :param cube: CrimeCube.
+    :param metric: Rate metric, averaged over the source rows of each cell.
+    :param horizon: Years to project beyond the last year of data.
+    :param target: Fractional reduction to reach by the horizon.
+    :param workers: Number of worker processes, see forecast_series.
+    :return: Tuple of (history, projections). History is a long DataFrame of Jurisdiction, Year and Value.
+        Projections has Jurisdiction, Year, Forecast, Lower, Upper, Target, Gap and GapPct for the
+        projected years, where a positive Gap means the forecast is above the reduction path.
+    """
+    panel = cube.panel(metric)
+    panel.loc[STATEWIDE] = cube.year_mean[metric]
+    base_year = int(cube.years.max())
+    end_year = base_year + horizon
+    # Missing years are kept so forecast_series can interpolate them
+    series = {jurisdiction: values for jurisdiction, values in panel.iterrows()}
+    forecasts = forecast_series(series, end_year, workers=workers)
+
+    history = panel.rename_axis(index='Jurisdiction', columns='Year').stack().rename('Value').reset_index()
+    frames = []
+    for jurisdiction, forecast in forecasts.items():
+        observed = series[jurisdiction].dropna()
+        baseline = observed.iloc[-1]
+        # Only the years after the data, so every jurisdiction is compared over the same horizon
+        forecast = forecast.loc[base_year + 1:end_year].copy()
+        steps = forecast.index.to_numpy() - base_year
+        forecast['Target'] = baseline * (1 - target * steps / horizon)
+        forecast.insert(0, 'Jurisdiction', jurisdiction)
+        frames.append(forecast.reset_index())
+    columns = ['Jurisdiction', 'Year', 'Forecast', 'Lower', 'Upper', 'Target']
+    projections = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    projections[['Forecast', 'Lower', 'Upper']] = projections[['Forecast', 'Lower', 'Upper']].clip(lower=0)
+    projections['Gap'] = projections['Forecast'] - projections['Target']
+    projections['GapPct'] = projections['Gap'] / projections['Target'] * 100
+    return history, projections
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+def _trailing_sum(values, window):
+    """Sum of the trailing window along the year axis of a (jurisdiction, year) array."""
+    cumulative = np.cumsum(values, axis=1)
+    result = cumulative.copy()
+    result[:, window:] -= cumulative[:, :-window]
+    return result
+
+def rolling_hotspots(cube, crime_types, window=5):
+    """
+    Classify every jurisdiction in every year over a trailing window of years.
+    A jurisdiction is a hotspot in a year when its crime rate over the window, total crime
+    divided by the population summed over the years with data, is above the average rate of
+    all jurisdictions that year. The rate is per year, so jurisdictions that did not report in
+    every year of the window are compared fairly. Windows at the start of the series use the
+    years available so far.
+    :param cube: CrimeCube.
+    :param crime_types: Crime count columns that make up total crime.
+    :param window: Number of years in the trailing window, including the year itself.
+    :return: Tuple of (rates, hotspots, average), with rates and hotspots as Jurisdiction x Year
+        DataFrames and average a Series of the mean rate per Year.
+    """
+    columns = [cube.metrics.index(crime) for crime in crime_types]
+    has_data = cube.counts > 0
+    crime = cube.sums[:, :, columns].sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        population = np.where(has_data, cube.sums[:, :, cube.metrics.index('Population')] / cube.counts, 0.0)
+
+    window = max(1, min(window, len(cube.years)))
+    years_with_data = _trailing_sum(has_data.astype(np.int64), window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rates = _trailing_sum(crime, window) / _trailing_sum(population, window) * 100000
+    rates[(years_with_data == 0) | ~np.isfinite(rates)] = np.nan
+
+    average = np.nanmean(rates, axis=0) if len(rates) else np.full(len(cube.years), np.nan)
+    hotspots = rates > average
+    return (pd.DataFrame(rates, index=cube.jurisdictions, columns=cube.years),
+            pd.DataFrame(hotspots, index=cube.jurisdictions, columns=cube.years),
+            pd.Series(average, index=cube.years, name='AverageRate'))
+
+def hotspot_persistence(hotspots, observed=None):
+    """
+    Summarize how long each jurisdiction has been a hotspot.
+    :param hotspots: Boolean Jurisdiction x Year DataFrame from rolling_hotspots.
+    :param observed: Optional boolean Jurisdiction x Year DataFrame of the cells that were classified,
+        e.g. rates.notna(). HotspotShare is the share of these years. Defaults to every year.
+    :return: DataFrame with HotspotYears, HotspotShare, CurrentStreak, LongestStreak,
+        FirstYear and LastYear per jurisdiction, most persistent first.
+    """
+    flags = hotspots.to_numpy()
+    years = hotspots.columns.to_numpy()
+    n_years = flags.shape[1]
+
+    # Length of the run of hotspot years ending at each year
+    positions = np.arange(n_years)
+    last_break = np.maximum.accumulate(np.where(flags, -1, positions), axis=1)
+    streaks = np.where(flags, positions - last_break, 0)
+
+    classified = flags.shape[1] if observed is None else observed.to_numpy().sum(axis=1)
+    any_year = flags.any(axis=1)
+    first = np.where(any_year, years[flags.argmax(axis=1)], np.nan) if n_years else np.nan
+    last = np.where(any_year, years[n_years - 1 - flags[:, ::-1].argmax(axis=1)], np.nan) if n_years else np.nan
+    persistence = pd.DataFrame({
+        'HotspotYears': flags.sum(axis=1),
+        'HotspotShare': np.divide(flags.sum(axis=1) * 100, classified,
+                                  out=np.zeros(len(flags)), where=classified > 0),
+        'CurrentStreak': streaks[:, -1] if n_years else 0,
+        'LongestStreak': streaks.max(axis=1) if n_years else 0,
+        'FirstYear': pd.array(first, dtype='Int64'),
+        'LastYear': pd.array(last, dtype='Int64'),
+    }, index=hotspots.index)
+    return persistence.sort_values(['HotspotYears', 'CurrentStreak'], ascending=False).reset_index()
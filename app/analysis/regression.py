@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+FIT_COLUMNS = ['n', 'r', 'r2', 'slope', 'intercept', 'stderr', 'p_value', 'x_min', 'x_max']
+
+def linear_fits(x, y):
+    """
+    Least-squares fit and Pearson correlation of every column of y against x, as matrix operations.
+    Rows where x or the column is missing are left out of that column's fit only.
+    :param x: Predictor, a Series or array of shape (n,), or a DataFrame or array of shape (n, m)
+        with one predictor per column of y.
+    :param y: DataFrame or array of shape (n, m), one response per column.
+    :return: DataFrame indexed by the columns of y with FIT_COLUMNS. Statistics match
+        scipy.stats.linregress and are NaN for columns with fewer than three valid rows.
+    """
+    index = y.columns if isinstance(y, pd.DataFrame) else pd.RangeIndex(np.shape(y)[1])
+    y = np.asarray(y, dtype=float)
+    x = np.broadcast_to(np.asarray(x, dtype=float).reshape(len(y), -1), y.shape)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    n = valid.sum(axis=0)
+    xv = np.where(valid, x, 0.0)
+    yv = np.where(valid, y, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = xv.sum(axis=0) / n
+        y_mean = yv.sum(axis=0) / n
+        dx = np.where(valid, x - x_mean, 0.0)
+        dy = np.where(valid, y - y_mean, 0.0)
+        sxx = (dx * dx).sum(axis=0)
+        syy = (dy * dy).sum(axis=0)
+        sxy = (dx * dy).sum(axis=0)
+
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        r = np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0)
+        dof = n - 2
+        t = r * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+        p_value = 2 * stats.t.sf(np.abs(t), dof)
+        stderr = np.sqrt((1 - r ** 2) * syy / sxx / dof)
+
+    too_few = n < 3
+    result = pd.DataFrame({
+        'n': n,
+        'r': r,
+        'r2': r ** 2,
+        'slope': slope,
+        'intercept': intercept,
+        'stderr': stderr,
+        'p_value': np.where(np.abs(r) == 1, 0.0, p_value),
+        'x_min': np.where(valid, x, np.inf).min(axis=0),
+        'x_max': np.where(valid, x, -np.inf).max(axis=0),
+    }, index=index)
+    result.loc[too_few, FIT_COLUMNS[1:]] = np.nan
+    return result
+
+def fitted_line(fit):
+    """
+    End points of a fitted line, which is all a chart needs to draw it.
+    :param fit: One row of linear_fits.
+    :return: Tuple of (x values, y values) arrays of length two.
+    """
+    x = np.array([fit['x_min'], fit['x_max']])
+    return x, fit['intercept'] + fit['slope'] * x
+
+def yearly_fits(cube, x_metric, metrics, how='mean'):
+    """
+    Fit every metric against x_metric across jurisdictions, separately for each year.
+    All years and metrics are solved in one linear_fits call.
+    :param cube: CrimeCube.
+    :param x_metric: Predictor metric, e.g. 'Population'.
+    :param metrics: Response metrics.
+    :param how: 'sum' or 'mean' over the source rows of each cell.
+    :return: DataFrame indexed by (Year, metric) with FIT_COLUMNS.
+    """
+    columns = [cube.metrics.index(metric) for metric in [x_metric] + list(metrics)]
+    values = cube.sums[:, :, columns]
+    counts = cube.counts[:, :, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = values / counts if how == 'mean' else np.where(counts > 0, values, np.nan)
+    n_jurisdictions, n_years = values.shape[:2]
+    x = np.repeat(values[:, :, 0], len(metrics), axis=1)
+    y = values[:, :, 1:].reshape(n_jurisdictions, n_years * len(metrics))
+    fits = linear_fits(x, y)
+    fits.index = pd.MultiIndex.from_product([cube.years, list(metrics)], names=['Year', 'Metric'])
+    return fits
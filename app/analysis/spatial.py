@@ -0,0 +1,140 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+
+# Maryland jurisdictions that share a boundary, each pair listed once. River boundaries
+# (Susquehanna, Patuxent) count as shared, crossings of the Chesapeake Bay do not.
+ADJACENCY_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'md_county_adjacency.csv')
+
+# Gi* z-score beyond which a unit is reported as a hot or cold spot (95% two-sided)
+GI_CRITICAL_Z = 1.96
+
+def load_adjacency(filepath=None):
+    """
+    Load an adjacency table.
+    :param filepath: CSV with Jurisdiction and Neighbor columns. Defaults to the bundled Maryland table.
+    :return: DataFrame of neighbouring pairs.
+    """
+    return pd.read_csv(filepath or ADJACENCY_PATH)
+
+def weight_matrix(units, adjacency):
+    """
+    Build a sparse binary contiguity matrix aligned to a list of units.
+    Pairs that name units outside the list are ignored, and units without neighbours get an empty row.
+    :param units: Index or list of unit names, in matrix order.
+    :param adjacency: DataFrame of neighbouring pairs from load_adjacency.
+    :return: Symmetric scipy.sparse CSR matrix of shape (n, n) with a zero diagonal.
+    """
+    units = pd.Index(units)
+    i = units.get_indexer(adjacency['Jurisdiction'])
+    j = units.get_indexer(adjacency['Neighbor'])
+    known = (i >= 0) & (j >= 0) & (i != j)
+    rows = np.concatenate([i[known], j[known]])
+    cols = np.concatenate([j[known], i[known]])
+    weights = sparse.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(units), len(units))).tocsr()
+    weights.data[:] = 1.0  # Collapse pairs listed twice
+    return weights
+
+def _column_moments(values, valid):
+    n = valid.sum(axis=0)
+    x = np.where(valid, values, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = x.sum(axis=0) / n
+        std = np.sqrt((x * x).sum(axis=0) / n - mean ** 2)
+    return x, n, mean, std
+
+def getis_ord_gi_star(values, weights):
+    """
+    Getis-Ord Gi* z-scores of every unit for many variables at once.
+    Each unit is its own neighbour. Missing values are left out of their column's statistics.
+    :param values: Array of shape (n, k), one column per variable, e.g. per year and crime type.
+    :param weights: Sparse binary matrix of shape (n, n) from weight_matrix.
+    :return: Array of shape (n, k) of z-scores, NaN where a value is missing.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    x, n, mean, std = _column_moments(values, valid)
+    with_self = (weights + sparse.identity(weights.shape[0], format='csr')).tocsr()
+    with_self.data[:] = 1.0
+    valid_f = valid.astype(float)
+    lag = with_self @ x
+    weight_sum = with_self @ valid_f  # Binary weights, so the sum of squares is the same
+    with np.errstate(invalid='ignore', divide='ignore'):
+        denominator = std * np.sqrt((n * weight_sum - weight_sum ** 2) / (n - 1))
+        z = (lag - mean * weight_sum) / denominator
+    z[~valid] = np.nan
+    return z
+
+def local_morans_i(values, weights):
+    """
+    Local Moran's I of every unit for many variables at once, with row-standardized weights.
+    :param values: Array of shape (n, k), one column per variable.
+    :param weights: Sparse binary matrix of shape (n, n) from weight_matrix.
+    :return: Tuple of (I, quadrant) arrays of shape (n, k). Quadrant is 'High-High', 'Low-Low',
+        'High-Low' or 'Low-High' for the unit's value and its neighbours' average, '' where undefined.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    _, n, mean, std = _column_moments(values, valid)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(valid, (values - mean) / std, 0.0)
+        lag = (weights @ z) / (weights @ valid.astype(float))
+    local_i = z * lag
+    defined = valid & np.isfinite(lag)
+    local_i[~defined] = np.nan
+    quadrant = np.select([z > 0, z <= 0], ['High', 'Low'], '').astype(object) + '-' + \
+        np.select([lag > 0, lag <= 0], ['High', 'Low'], '').astype(object)
+    quadrant[~defined] = ''
+    return local_i, quadrant
+
+def classify_gi(z, critical=GI_CRITICAL_Z):
+    """
+    Label Gi* z-scores.
+    :return: Array of 'Hot Spot', 'Cold Spot' or 'Not Significant'.
+    """
+    return np.select([z > critical, z < -critical], ['Hot Spot', 'Cold Spot'], 'Not Significant')
+
+def local_statistics(values, weights):
+    """
+    Gi* and local Moran's I for a units x variables table.
+    :param values: DataFrame indexed by unit with one column per variable.
+    :param weights: Sparse binary matrix aligned to the index of values.
+    :return: Long DataFrame with Jurisdiction, Variable, Value, GiZ, GiPValue, GiClass, MoranI and MoranQuadrant.
+    """
+    array = values.to_numpy(dtype=float)
+    gi = getis_ord_gi_star(array, weights)
+    moran, quadrant = local_morans_i(array, weights)
+    n_units, n_vars = array.shape
+    return pd.DataFrame({
+        'Jurisdiction': np.repeat(values.index.to_numpy(), n_vars),
+        'Variable': np.tile(values.columns.to_numpy(), n_units),
+        'Value': array.ravel(),
+        'GiZ': gi.ravel(),
+        'GiPValue': 2 * stats.norm.sf(np.abs(gi.ravel())),
+        'GiClass': classify_gi(gi.ravel()),
+        'MoranI': moran.ravel(),
+        'MoranQuadrant': quadrant.ravel(),
+    })
+
+def yearly_local_statistics(cube, metrics, weights=None):
+    """
+    Gi* and local Moran's I of every jurisdiction for every year and metric, in one batched pass.
+    :param cube: CrimeCube.
+    :param metrics: Rate metrics to analyse, averaged over the source rows of each cell.
+    :param weights: Sparse weight matrix aligned to cube.jurisdictions. Defaults to the bundled adjacency.
+    :return: Long DataFrame with Year, Metric and the columns of local_statistics.
+    """
+    if weights is None:
+        weights = weight_matrix(cube.jurisdictions, load_adjacency())
+    columns = [cube.metrics.index(metric) for metric in metrics]
+    counts = cube.counts[:, :, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = cube.sums[:, :, columns] / counts
+    table = pd.DataFrame(values.reshape(len(cube.jurisdictions), -1), index=cube.jurisdictions,
+                         columns=pd.RangeIndex(len(cube.years) * len(metrics)))
+    result = local_statistics(table, weights)
+    variable = result.pop('Variable').to_numpy()
+    result.insert(1, 'Year', cube.years.to_numpy()[variable // len(metrics)])
+    result.insert(2, 'Metric', np.asarray(metrics, dtype=object)[variable % len(metrics)])
+    return result
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+from app.analysis.regression import linear_fits
+
+# Series per block, which bounds the (series x year pairs) working arrays
+SERIES_BLOCK = 2000
+
+def _pair_statistics(values, times):
+    """
+    Mann-Kendall, Sen's slope and Pettitt statistics of a block of series.
+    :param values: Array of shape (S, T), NaN where a year is missing.
+    :param times: Array of shape (T,) of the years.
+    :return: Dictionary of arrays of shape (S,).
+    """
+    n_times = values.shape[1]
+    i, j = np.triu_indices(n_times, k=1)
+    valid = ~np.isnan(values)
+    n = valid.sum(axis=1)
+    pair_valid = valid[:, i] & valid[:, j]
+    diff = np.where(pair_valid, values[:, j] - values[:, i], np.nan)
+    signs = np.nan_to_num(np.sign(diff))
+
+    # Incidence of each pair's earlier and later year, to fold pair values back onto years
+    earlier = np.zeros((len(i), n_times))
+    later = np.zeros((len(i), n_times))
+    earlier[np.arange(len(i)), i] = 1
+    later[np.arange(len(i)), j] = 1
+
+    # Mann-Kendall S with the variance corrected for tied values
+    s = signs.sum(axis=1)
+    ties = (pair_valid & (diff == 0)).astype(float) @ (earlier + later) + 1
+    tie_term = np.where(valid, (ties - 1) * (2 * ties + 5), 0).sum(axis=1)
+    variance = (n * (n - 1) * (2 * n + 5) - tie_term) / 18
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(s > 0, s - 1, np.where(s < 0, s + 1, 0)) / np.sqrt(variance)
+        tau = s / (n * (n - 1) / 2)
+    mk_p = 2 * stats.norm.sf(np.abs(z))
+
+    # Sen's slope is the median of the pairwise slopes
+    with np.errstate(all='ignore'):
+        sen = np.nanmedian(diff / (times[j] - times[i]), axis=1) if len(i) else np.full(len(values), np.nan)
+
+    # Pettitt: U_t accumulates, year by year, the signs of that year against every other year
+    u = np.cumsum(signs @ (later - earlier) * -1, axis=1)
+    k = np.abs(u).max(axis=1) if n_times else np.zeros(len(values))
+    change = np.abs(u).argmax(axis=1) if n_times else np.zeros(len(values), dtype=int)
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        pettitt_p = np.minimum(1.0, 2 * np.exp(-6 * k ** 2 / (n.astype(float) ** 3 + n.astype(float) ** 2)))
+
+    too_few = n < 3
+    return {
+        'n': n,
+        'MKTau': np.where(too_few, np.nan, tau),
+        'MKZ': np.where(too_few, np.nan, z),
+        'MKPValue': np.where(too_few, np.nan, mk_p),
+        'SenSlope': np.where(too_few, np.nan, sen),
+        'ChangePointYear': np.where(too_few | (k == 0), np.nan, times[change]),
+        'ChangePointPValue': np.where(too_few | (k == 0), np.nan, pettitt_p),
+    }
+
+def series_trends(values, times):
+    """
+    Trend statistics of many yearly series in one vectorized pass over the time axis.
+    :param values: Array of shape (S, T), one series per row, NaN where a year is missing.
+    :param times: Array of shape (T,) of the years.
+    :return: DataFrame with one row per series: n, OLSSlope, OLSPValue, MKTau, MKZ, MKPValue, SenSlope,
+        SenSlopePct (Sen's slope as a percentage of the series mean), ChangePointYear, the last year
+        before the most likely shift in level (Pettitt), and ChangePointPValue.
+    """
+    values = np.asarray(values, dtype=float)
+    times = np.asarray(times, dtype=float)
+    blocks = []
+    for start in range(0, len(values), SERIES_BLOCK):
+        block = values[start:start + SERIES_BLOCK]
+        fits = linear_fits(times, block.T)
+        result = _pair_statistics(block, times)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nansum(block, axis=1) / result['n']
+        blocks.append(pd.DataFrame({
+            'n': result['n'],
+            'OLSSlope': fits['slope'].to_numpy(),
+            'OLSPValue': fits['p_value'].to_numpy(),
+            'MKTau': result['MKTau'],
+            'MKZ': result['MKZ'],
+            'MKPValue': result['MKPValue'],
+            'SenSlope': result['SenSlope'],
+            'SenSlopePct': result['SenSlope'] / mean * 100,
+            'ChangePointYear': pd.array(result['ChangePointYear'], dtype='Int64'),
+            'ChangePointPValue': result['ChangePointPValue'],
+        }))
+    if not blocks:
+        return pd.DataFrame(columns=['n', 'OLSSlope', 'OLSPValue', 'MKTau', 'MKZ', 'MKPValue', 'SenSlope',
+                                     'SenSlopePct', 'ChangePointYear', 'ChangePointPValue'])
+    return pd.concat(blocks, ignore_index=True)
+
+def classify_trend(trends, alpha=0.05):
+    """
+    Label Mann-Kendall results.
+    :return: Array of 'Rising', 'Falling' or 'No Significant Trend'.
+    """
+    significant = trends['MKPValue'] < alpha
+    return np.select([significant & (trends['MKZ'] > 0), significant & (trends['MKZ'] < 0)],
+                     ['Rising', 'Falling'], 'No Significant Trend')
+
+def jurisdiction_trends(cube, metrics, start_year=None, end_year=None):
+    """
+    Trend statistics of every jurisdiction x metric series.
+    :param cube: CrimeCube.
+    :param metrics: Metrics to analyse, averaged over the source rows of each cell.
+    :param start_year: First year to include. Defaults to the first year of the cube.
+    :param end_year: Last year to include. Defaults to the last year of the cube.
+    :return: DataFrame with Jurisdiction, Metric, Trend and the columns of series_trends.
+    """
+    years = cube.years
+    keep = (years >= (start_year or years.min())) & (years <= (end_year or years.max()))
+    columns = [cube.metrics.index(metric) for metric in metrics]
+    counts = cube.counts[:, keep, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = cube.sums[:, keep][:, :, columns] / counts
+    # (jurisdiction, metric) rows over the year axis
+    series = values.transpose(0, 2, 1).reshape(-1, keep.sum())
+    trends = series_trends(series, years[keep].to_numpy())
+    trends.insert(0, 'Metric', np.tile(np.asarray(metrics, dtype=object), len(cube.jurisdictions)))
+    trends.insert(0, 'Jurisdiction', np.repeat(cube.jurisdictions.to_numpy(), len(metrics)))
+    trends.insert(2, 'Trend', classify_trend(trends))
+    return trends
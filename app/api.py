@@ -0,0 +1,190 @@
+"""
+Read-only HTTP/JSON API over the aggregates the dashboard shows.
+
+    maryland-crime-api --port 8765
+
+The dataset is loaded once into the shared store at start-up. Responses are
+serialized once per dataset version and query, then served from memory with an
+ETag for conditional GETs and gzip when the client accepts it.
+
+Endpoints:
+
+* /health
+* /v1/version: dataset version and cache usage
+* /v1/statewide: statewide totals and mean rates per year
+* /v1/jurisdictions/rates: average crime rate per jurisdiction against the state average
+* /v1/hotspots[?window=N]: all-period hotspot flags, or per-year flags over a trailing window
+* /v1/changes[?crime=MurderPer100k][&jurisdiction=...]: capped year-over-year change of each crime rate
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import sys
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from app.cache import LRUCache
+from app.components import crime_hotspots, crime_rate_changes, geographical_analysis
+from app.data.data_loader import dataset_version, get_cube, get_derived
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+logger = logging.getLogger(__name__)
+
+# (version, path, query) -> (body, gzipped body, ETag)
+response_cache = LRUCache(max_entries=512, max_bytes=64 * 1024 * 1024,
+                          sizeof=lambda entry: len(entry[0]) + len(entry[1] or b''))
+
+class NotFound(Exception):
+    pass
+
+def _records(df):
+    return json.loads(df.to_json(orient='records'))
+
+def statewide(cube, query):
+    """Statewide totals and mean rates per year."""
+    return {'totals': _records(cube.year_sum.reset_index()), 'means': _records(cube.year_mean.reset_index())}
+
+def jurisdiction_rates(cube, query):
+    """Average crime rate per jurisdiction compared to the state average."""
+    avg_crime_rates, state_avg_crime_rate = geographical_analysis.prepare_jurisdiction_rates(cube)
+    return {'state_average': state_avg_crime_rate, 'jurisdictions': _records(avg_crime_rates)}
+
+def hotspots(cube, query):
+    """Hotspot flags over the whole period, or per year over a trailing window with ?window=N."""
+    if 'window' not in query:
+        table, avg_crime_rate = crime_hotspots.prepare_hotspots(cube)
+        return {'average_rate': avg_crime_rate, 'jurisdictions': _records(table)}
+    window = int(query['window'])
+    if window < 1:
+        raise ValueError(f"window must be at least 1, got {window}")
+    rates, flags, average, persistence = crime_hotspots.prepare_rolling_hotspots(cube, window)
+    per_year = rates.stack().rename('CrimeRate').to_frame().join(flags.stack().rename('Hotspot'))
+    return {'window': window,
+            'average_rate': {str(year): rate for year, rate in average.items()},
+            'years': _records(per_year.reset_index()),
+            'persistence': _records(persistence)}
+
+def changes(cube, query):
+    """
+    Capped year-over-year change of each crime rate, optionally for one crime rate with ?crime=
+    and for one jurisdiction instead of the statewide totals with ?jurisdiction=.
+    """
+    crimes = crime_rate_changes.CRIME_TYPES
+    if 'crime' in query:
+        if query['crime'] not in crimes:
+            raise NotFound(f"Unknown crime rate: {query['crime']}")
+        crimes = [query['crime']]
+    jurisdiction = query.get('jurisdiction')
+    if jurisdiction is not None and jurisdiction not in cube.jurisdictions:
+        raise NotFound(f"Unknown jurisdiction: {jurisdiction}")
+    return {'changes': _records(get_derived().changes(crimes, jurisdiction))}
+
+# Path -> function of (cube, query) returning a JSON-serializable payload
+ROUTES = {
+    '/v1/statewide': statewide,
+    '/v1/jurisdictions/rates': jurisdiction_rates,
+    '/v1/hotspots': hotspots,
+    '/v1/changes': changes,
+}
+
+def render(path, query):
+    """
+    Serialize the response of a route for the current dataset version.
+    :param path: Request path.
+    :param query: Dictionary of query parameters.
+    :return: Tuple of (body, gzipped body or None, ETag).
+    """
+    version = dataset_version()
+    if path == '/v1/version':
+        payload = {'version': version, 'responses': response_cache.stats()}
+        body = json.dumps(payload).encode('utf-8')
+        return body, None, f'"{hashlib.sha1(body).hexdigest()}"'
+    if path not in ROUTES:
+        raise NotFound(f"Unknown path: {path}")
+
+    def build():
+        payload = {'version': version, **ROUTES[path](get_cube(), query)}
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        compressed = gzip.compress(body, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+        return body, compressed, f'"{hashlib.sha1(body).hexdigest()}"'
+
+    return response_cache.get_or_create((version, path, tuple(sorted(query.items()))), build)
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = 'MarylandCrimeAPI/1.0'
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, so Nagle would stall keep-alive clients
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            return self._send(HTTPStatus.OK, b'{"status":"ok"}')
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            body, compressed, etag = render(url.path.rstrip('/') or '/', query)
+        except NotFound as e:
+            return self._send(HTTPStatus.NOT_FOUND, json.dumps({'error': str(e)}).encode('utf-8'))
+        except ValueError as e:
+            return self._send(HTTPStatus.BAD_REQUEST, json.dumps({'error': str(e)}).encode('utf-8'))
+        except Exception:
+            # Answer instead of dropping the keep-alive connection
+            logger.exception("Failed to render %s", self.path)
+            return self._send(HTTPStatus.INTERNAL_SERVER_ERROR, b'{"error":"Internal server error"}')
+
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            return self._send(HTTPStatus.NOT_MODIFIED, b'', etag)
+        if compressed is not None and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            return self._send(HTTPStatus.OK, compressed, etag, encoding='gzip')
+        return self._send(HTTPStatus.OK, body, etag)
+
+    def _send(self, status, body, etag=None, encoding=None):
+        self.send_response(status)
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        # Clients may keep responses but must revalidate, since the dataset can change
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if etag:
+            self.send_header('ETag', etag)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+def serve(host='127.0.0.1', port=8765):
+    """
+    Preload the dataset and serve the API until interrupted.
+    :param host: Interface to bind.
+    :param port: Port to listen on.
+    """
+    get_cube()
+    server = ThreadingHTTPServer((host, port), Handler)
+    logger.info("Serving dataset version %s on http://%s:%s", dataset_version(), host, server.server_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the dashboard aggregates as JSON.")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to bind")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    serve(args.host, args.port)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
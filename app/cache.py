@@ -0,0 +1,125 @@
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from app.config import FIGURE_CACHE_MAX_ENTRIES, FIGURE_CACHE_MAX_BYTES, RESULT_CACHE_MAX_BYTES
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by entry count and approximate size.
+    Values are shared between sessions and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or approx_size
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_or_create(self, key, factory):
+        """
+        Return the cached value for key, calling factory to build it on a miss.
+        :param key: Hashable key. It must cover every input the value depends on.
+        :param factory: Callable without arguments that builds the value.
+        :return: The cached or newly built value.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return self._entries[key][0]
+            self._stats['misses'] += 1
+        # Build outside the lock so slow factories don't block other sessions
+        value = factory()
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if self.max_bytes is None or size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self._bytes += size
+                self._evict()
+        return value
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or
+                                 (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._stats['evictions'] += 1
+
+    def stats(self):
+        """
+        Report cache usage.
+        :return: Dictionary with hit, miss and eviction counters, the number of entries and their approximate size.
+        """
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries), 'bytes': self._bytes}
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._stats.update(hits=0, misses=0, evictions=0)
+
+def approx_size(value):
+    """
+    Estimate the memory held by a value in bytes.
+    Understands arrays, frames, indexed frames, containers, Plotly figures and Altair charts.
+    :param value: Value to measure.
+    :return: Approximate size in bytes.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    from app.data.query import IndexedFrame
+    if isinstance(value, IndexedFrame):
+        return value.nbytes
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(approx_size(item) for item in value)
+    if hasattr(value, 'to_plotly_json'):
+        return approx_size(value.to_plotly_json())
+    # An Altair chart can only exist once a page has imported Altair, so never import it here
+    alt = sys.modules.get('altair')
+    if alt is not None and isinstance(value, alt.TopLevelMixin):
+        data = getattr(value, 'data', None)
+        layers = [getattr(value, name, None) for name in ('layer', 'hconcat', 'vconcat', 'concat')]
+        return (approx_size(data) if isinstance(data, pd.DataFrame) else 0) + \
+            sum(approx_size(chart) for charts in layers if isinstance(charts, list) for chart in charts)
+    return 64
+
+# Built chart figures shared by every session
+figure_cache = LRUCache(FIGURE_CACHE_MAX_ENTRIES, FIGURE_CACHE_MAX_BYTES)
+
+def cached_figure(key, build):
+    """
+    Return a chart from the shared figure cache, building it on a miss.
+    Cached figures are shared between sessions, so callers must not modify them.
+    :param key: Tuple of the page, the chart, the dataset version and the widget values the chart depends on.
+    :param build: Callable without arguments that builds the chart.
+    :return: Plotly figure or Altair chart.
+    """
+    return figure_cache.get_or_create(key, build)
+
+# Results of expensive analyses shared by every session
+result_cache = LRUCache(FIGURE_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES)
+
+def cached_result(key, compute):
+    """
+    Return an analysis result from the shared result cache, computing it on a miss.
+    Cached results are shared between sessions, so callers must not modify them.
+    :param key: Tuple of the analysis, the dataset version and the parameters the result depends on.
+    :param compute: Callable without arguments that computes the result.
+    :return: The cached or newly computed result.
+    """
+    return result_cache.get_or_create(key, compute)
@@ -2,18 +2,26 @@ import streamlit as st
 import altair as alt
 import pandas as pd
 import numpy as np
-from app.data.data_loader import load_data
-
-def calculate_capped_pct_change(series, cap=10):
-    """Calculate percentage change with capping for extreme values."""
-    pct_change = series.pct_change()
-    return pct_change.clip(lower=-cap, upper=cap)
+from app.data.data_loader import dataset_version, derived_metrics, get_derived
+from app.cache import cached_figure
+from app.config import PCT_CHANGE_CAP
+from app.components.downloads import download_buttons
+from app import profiling
+
+# Define crime types
+CRIME_TYPES_ABSOLUTE = ['Murder', 'Rape', 'Robbery', 'AggAssault', 'BreakAndEnter', 'LarcenyTheft', 'MotorVehicleTheft']
+CRIME_TYPES_PER_100K = [f'{crime}Per100k' for crime in CRIME_TYPES_ABSOLUTE]
+
+def prepare_distribution(derived, selected_crimes):
+    """Per-year totals of the selected crime types, wide and melted for charting."""
+    crime_data = derived.statewide[selected_crimes].reset_index()
+    crime_data_melted = crime_data.melt('Year', var_name='Crime Type', value_name='Count')
+    return crime_data, crime_data_melted
 
-def prepare_data(df, selected_columns):
-    """Prepare data for analysis and visualization."""
-    crime_data = df[selected_columns + ['Year']].groupby('Year').sum()
-    crime_data_pct_change = crime_data.apply(calculate_capped_pct_change).reset_index().melt('Year', var_name='Crime Type', value_name='Pct Change')
-    return crime_data_pct_change.dropna()
+def summarize_distribution(derived, selected_crimes):
+    """Share of each crime type over the whole period and its change from the first to the last year."""
+    distribution_change, start_year, end_year = derived.distribution_change(selected_crimes)
+    return derived.summary(selected_crimes), distribution_change, start_year, end_year
 
 def create_stacked_area_chart(data):
     """Create an Altair stacked area chart for crime distribution."""
@@ -54,16 +62,15 @@ def format_pct_change(value):
     """Format percentage change, handling extreme values."""
     if pd.isna(value):
         return 'N/A'
-    elif value == 10:  # Our cap value
-        return '>1000%'
-    elif value == -10:  # Our negative cap value
-        return '<-1000%'
+    elif value == PCT_CHANGE_CAP:
+        return f'>{PCT_CHANGE_CAP:.0%}'
+    elif value == -PCT_CHANGE_CAP:
+        return f'<-{PCT_CHANGE_CAP:.0%}'
     else:
         return f'{value:.2f}%'
 
 def show_top_changes(data, top_n=5):
     """Display top increases and decreases in crime rates."""
-    data['Absolute Change'] = data['Pct Change'].abs()
     top_increases = data.nlargest(top_n, 'Pct Change')
     top_decreases = data.nsmallest(top_n, 'Pct Change')
 
@@ -73,24 +80,38 @@ def show_top_changes(data, top_n=5):
     st.write(f"### Top {top_n} Decreases in Crime Rates")
     st.table(top_decreases[['Year', 'Crime Type', 'Pct Change']].style.format({'Pct Change': format_pct_change}))
 
-def show():
-    st.header("Crime Distribution and Rate Changes Analysis in Maryland")
-    st.write("Explore the distribution of crime types and analyze significant changes in crime rates in Maryland over the years.")
-
-    # Load data
-    df = load_data('app/data/cleaned_MD_Crime_Data.csv')
-
-    # Define crime types
-    crime_types_absolute = ['Murder', 'Rape', 'Robbery', 'AggAssault', 'BreakAndEnter', 'LarcenyTheft', 'MotorVehicleTheft']
-    crime_types_per_100k = [f'{crime}Per100k' for crime in crime_types_absolute]
-
+def report(cube):
+    """
+    Build the page's charts and tables with the default widget states, without Streamlit.
+    :param cube: CrimeCube.
+    :return: List of (heading, chart, table or text) sections.
+    """
+    selected_crimes = CRIME_TYPES_ABSOLUTE[:3]
+    derived = derived_metrics(cube)
+    crime_data, crime_data_melted = prepare_distribution(derived, selected_crimes)
+    crime_summary, distribution_change, start_year, end_year = summarize_distribution(derived, selected_crimes)
+    return [
+        ("Distribution of Crime Types", create_stacked_area_chart(crime_data_melted)),
+        ("Most Common Crime Types", crime_summary),
+        (f"Change in Crime Distribution from {start_year} to {end_year}", distribution_change),
+        ("Percentage Change in Crime Counts", create_line_chart(derived.changes(selected_crimes))),
+    ]
+
+@st.fragment
+def show_distribution(derived, version):
+    """
+    Charts and tables of the selected metric and crime types. The widgets drive the whole section,
+    so changing them reruns it without reloading the page's data.
+    :param derived: DerivedMetrics of the current dataset.
+    :param version: Dataset version the figures are cached under.
+    """
     # User interface for metric selection
     metric_choice = st.radio(
         "Choose the metric for analysis:",
         ("Absolute Numbers", "Rates per 100,000 Population")
     )
 
-    selected_columns = crime_types_absolute if metric_choice == "Absolute Numbers" else crime_types_per_100k
+    selected_columns = CRIME_TYPES_ABSOLUTE if metric_choice == "Absolute Numbers" else CRIME_TYPES_PER_100K
 
     # User interface for crime type selection
     selected_crimes = st.multiselect(
@@ -104,24 +125,18 @@ def show():
         return
 
     # Prepare data for stacked area chart
-    crime_data = df[selected_crimes + ['Year']].groupby('Year').sum().reset_index()
-    crime_data_melted = crime_data.melt('Year', var_name='Crime Type', value_name='Count')
+    with profiling.stage('aggregate'):
+        crime_data, crime_data_melted = prepare_distribution(derived, selected_crimes)
+        crime_summary, distribution_change, start_year, end_year = summarize_distribution(derived, selected_crimes)
 
     # Display stacked area chart
-    stacked_area_chart = create_stacked_area_chart(crime_data_melted)
-    st.altair_chart(stacked_area_chart, use_container_width=True)
+    with profiling.stage('charts'):
+        stacked_area_chart = cached_figure(('crime_distribution', 'stacked_area', version, tuple(selected_crimes)),
+                                           lambda: create_stacked_area_chart(crime_data_melted))
+        st.altair_chart(stacked_area_chart, use_container_width=True)
 
     # Most common crime types
     st.subheader("Most Common Crime Types")
-    total_by_crime = crime_data[selected_crimes].sum().sort_values(ascending=False)
-    total_all_crimes = total_by_crime.sum()
-
-    crime_summary = pd.DataFrame({
-        'Crime Type': total_by_crime.index,
-        'Total Count': total_by_crime.values,
-        'Percentage': (total_by_crime.values / total_all_crimes) * 100
-    })
-
     st.table(crime_summary.style.format({
         'Total Count': '{:,.0f}',
         'Percentage': '{:.2f}%'
@@ -134,19 +149,7 @@ def show():
     for i, crime in enumerate(top_crimes, 1):
         st.write(f"{i}. {crime} ({crime_summary.loc[crime_summary['Crime Type'] == crime, 'Percentage'].values[0]:.2f}% of all crimes)")
 
-    # Calculate change in distribution from start to end
-    start_year = crime_data['Year'].min()
-    end_year = crime_data['Year'].max()
-    start_distribution = crime_data[crime_data['Year'] == start_year][selected_crimes].iloc[0]
-    end_distribution = crime_data[crime_data['Year'] == end_year][selected_crimes].iloc[0]
-
-    distribution_change = pd.DataFrame({
-        'Crime Type': selected_crimes,
-        'Start Percentage': (start_distribution / start_distribution.sum()) * 100,
-        'End Percentage': (end_distribution / end_distribution.sum()) * 100,
-        'Change': ((end_distribution / end_distribution.sum()) - (start_distribution / start_distribution.sum())) * 100
-    })
-
+    # Change in distribution from start to end
     st.write(f"### Change in Crime Distribution from {start_year} to {end_year}")
     st.table(distribution_change.style.format({
         'Start Percentage': '{:.2f}%',
@@ -166,26 +169,18 @@ def show():
         st.write("No significant changes (>1 percentage point) in the distribution of crime types were observed.")
 
     # Prepare data for percentage change analysis
-    crime_data_pct_change = prepare_data(df, selected_crimes)
+    with profiling.stage('aggregate'):
+        crime_data_pct_change = derived.changes(selected_crimes)
 
     # Display line chart for percentage changes
-    line_chart = create_line_chart(crime_data_pct_change)
-    st.altair_chart(line_chart, use_container_width=True)
+    with profiling.stage('charts'):
+        line_chart = cached_figure(('crime_distribution', 'pct_change', version, tuple(selected_crimes)),
+                                   lambda: create_line_chart(crime_data_pct_change))
+        st.altair_chart(line_chart, use_container_width=True)
 
     # Show top changes
     show_top_changes(crime_data_pct_change)
 
-    crime_summary = pd.DataFrame({
-        'Crime Type': total_by_crime.index,
-        'Total Count': total_by_crime.values,
-        'Percentage': (total_by_crime.values / total_all_crimes) * 100
-    })
-
-    st.table(crime_summary.style.format({
-        'Total Count': '{:,.0f}',
-        'Percentage': '{:.2f}%'
-    }))
-
     # Key insights
     st.subheader("Key Insights")
     st.write("1. The stacked area chart shows the distribution of crime types over time, allowing you to see how the proportion of each crime type has changed.")
@@ -195,10 +190,17 @@ def show():
     st.write("5. You can switch between absolute numbers and rates per 100,000 population to get different perspectives on the data.")
 
     # Data download option
-    csv = crime_data_melted.to_csv(index=False)
-    st.download_button(
-        label="Download crime distribution data as CSV",
-        data=csv,
-        file_name="maryland_crime_distribution.csv",
-        mime="text/csv",
-    )
+    with profiling.stage('export'):
+        download_buttons("crime distribution data", "maryland_crime_distribution",
+                         ('crime_distribution',) + tuple(selected_crimes), lambda: crime_data_melted)
+
+def show():
+    st.header("Crime Distribution and Rate Changes Analysis in Maryland")
+    st.write("Explore the distribution of crime types and analyze significant changes in crime rates in Maryland over the years.")
+
+    # Load data
+    with profiling.stage('load'):
+        derived = get_derived()
+        version = dataset_version()
+
+    show_distribution(derived, version)
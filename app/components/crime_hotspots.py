@@ -1,23 +1,32 @@
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from app.data.data_loader import load_data
+from app.data.data_loader import dataset_version, get_cube
+from app.analysis.spatial import GI_CRITICAL_Z, yearly_local_statistics
+from app.analysis.hotspots import hotspot_persistence, rolling_hotspots
+from app.cache import cached_figure, cached_result
+from app.data.downsample import downsample
+from app.data.query import IndexedFrame
+from app.components.downloads import download_buttons
+from app import profiling
 import pandas as pd
 import numpy as np
 
-def show():
-    df = load_data('app/data/cleaned_MD_Crime_Data.csv')
-    st.header("Crime Hotspots in Maryland")
-    st.write("Identify and analyze crime hotspots across different jurisdictions in Maryland to prioritize resource allocation.")
+# Define the crime types to be analyzed
+CRIME_TYPES = ['Murder', 'Rape', 'Robbery', 'AggAssault', 'BreakAndEnter', 'LarcenyTheft', 'MotorVehicleTheft']
+
+# Trailing windows, in years, offered for the hotspot classification over time
+WINDOW_OPTIONS = [3, 5, 10]
 
-    # Define the crime types to be analyzed
-    crime_types = ['Murder', 'Rape', 'Robbery', 'AggAssault', 'BreakAndEnter', 'LarcenyTheft', 'MotorVehicleTheft']
+# Rates analysed for spatial clustering
+SPATIAL_METRICS = ['OverallCrimeRatePer100k'] + [f'{crime}Per100k' for crime in CRIME_TYPES]
 
+def prepare_hotspots(cube):
+    """Crime rate per jurisdiction over the entire period, flagged against the average rate."""
     # Calculate the total crime rate per jurisdiction over the entire period
-    df['TotalCrime'] = df[crime_types].sum(axis=1)
-    total_crime_per_jurisdiction = df.groupby('Jurisdiction').agg({
-        'TotalCrime': 'sum',
-        'Population': 'mean'
+    total_crime_per_jurisdiction = pd.DataFrame({
+        'TotalCrime': cube.jurisdiction_sum[CRIME_TYPES].sum(axis=1),
+        'Population': cube.jurisdiction_mean['Population']
     }).reset_index()
 
     # Calculate crime rate per 100,000 inhabitants
@@ -31,8 +40,63 @@ def show():
 
     # Sort the jurisdictions by crime rate in descending order
     total_crime_per_jurisdiction = total_crime_per_jurisdiction.sort_values(by='CrimeRate', ascending=False)
+    return total_crime_per_jurisdiction, avg_crime_rate
 
-    # Create a bar chart to visualize the crime rate per jurisdiction
+def prepare_breakdown(cube, top_jurisdictions):
+    """Share of each crime type in the total crime of the given jurisdictions, in percent."""
+    crime_breakdown = cube.jurisdiction_sum.loc[top_jurisdictions, CRIME_TYPES]
+    return crime_breakdown.div(crime_breakdown.sum(axis=1), axis=0) * 100
+
+def prepare_trend(cube, jurisdictions):
+    """Total crime per year for the given jurisdictions."""
+    trend_data = cube.jurisdiction_year(CRIME_TYPES, jurisdictions=jurisdictions)
+    trend_data['TotalCrime'] = trend_data[CRIME_TYPES].sum(axis=1)
+    return trend_data
+
+def prepare_rolling_hotspots(cube, window):
+    """Hotspot classification of every jurisdiction and year over a trailing window, and its persistence."""
+    rates, hotspots, average = rolling_hotspots(cube, CRIME_TYPES, window)
+    return rates, hotspots, average, hotspot_persistence(hotspots, rates.notna())
+
+def prepare_year_hotspots(rates, hotspots, year):
+    """Windowed crime rate and hotspot flag of each jurisdiction in one year, highest rate first."""
+    year_hotspots = pd.DataFrame({'CrimeRate': rates[year], 'Hotspot': hotspots[year]}).dropna().reset_index()
+    return year_hotspots.sort_values(by='CrimeRate', ascending=False)
+
+def create_year_hotspot_chart(year_hotspots, avg_crime_rate, year, window):
+    """Create a Plotly bar chart of the windowed crime rate per jurisdiction in one year."""
+    fig = px.bar(year_hotspots, x='Jurisdiction', y='CrimeRate',
+                 title=f"Yearly Crime Rate by Jurisdiction in a Window of up to {window} Years to {year} (per 100,000 inhabitants)",
+                 labels={'CrimeRate': 'Crime Rate per 100,000', 'Jurisdiction': 'Jurisdiction'},
+                 color='Hotspot', color_discrete_map={True: 'red', False: 'blue'})
+    for trace in fig.data:
+        trace.name = 'Hotspot' if trace.name == 'True' else 'Not Hotspot'
+    fig.add_hline(y=avg_crime_rate, line_dash="dash", line_color="green", annotation_text="Average Crime Rate")
+    fig.update_layout(xaxis_tickangle=-45, legend_title_text='Hotspot Classification')
+    return fig
+
+def prepare_spatial_statistics(cube):
+    """
+    Getis-Ord Gi* and local Moran's I of every jurisdiction, year and rate, against the county adjacency.
+    Indexed by (Metric, Year) so the page can slice out one rate and year.
+    """
+    return IndexedFrame(yearly_local_statistics(cube, SPATIAL_METRICS), keys=('Metric', 'Year', 'Jurisdiction'))
+
+def create_gi_chart(year_statistics, metric, year):
+    """Create a Plotly bar chart of Gi* z-scores per jurisdiction coloured by hot and cold spot status."""
+    fig = px.bar(year_statistics.sort_values('GiZ', ascending=False), x='Jurisdiction', y='GiZ',
+                 title=f"Getis-Ord Gi* of {metric} in {year}",
+                 labels={'GiZ': 'Gi* z-score', 'GiClass': 'Classification'},
+                 color='GiClass',
+                 color_discrete_map={'Hot Spot': 'red', 'Cold Spot': 'blue', 'Not Significant': 'lightgray'},
+                 hover_data=['Value', 'GiPValue', 'MoranQuadrant'])
+    for bound in (GI_CRITICAL_Z, -GI_CRITICAL_Z):
+        fig.add_hline(y=bound, line_dash="dot", line_color="gray")
+    fig.update_layout(xaxis_tickangle=-45)
+    return fig
+
+def create_hotspot_chart(total_crime_per_jurisdiction, avg_crime_rate):
+    """Create a Plotly bar chart of the crime rate per jurisdiction coloured by hotspot status."""
     fig = px.bar(total_crime_per_jurisdiction,
                  x='Jurisdiction',
                  y='CrimeRate',
@@ -44,67 +108,165 @@ def show():
 
     # Update color legend
     fig.update_traces(showlegend=True)
-    fig.data[0].name = 'Hotspot'
-    fig.data[1].name = 'Not Hotspot'
+    for trace in fig.data:
+        trace.name = 'Hotspot' if trace.name == 'True' else 'Not Hotspot'
 
     fig.add_hline(y=avg_crime_rate, line_dash="dash", line_color="green", annotation_text="Average Crime Rate")
     fig.update_layout(xaxis_tickangle=-45, legend_title_text='Hotspot Classification')
+    return fig
 
-    st.plotly_chart(fig, use_container_width=True)
+def create_breakdown_heatmap(crime_breakdown_pct):
+    """Create a Plotly heatmap of the crime type breakdown."""
+    fig_heatmap = px.imshow(crime_breakdown_pct.T,
+                            labels=dict(x="Jurisdiction", y="Crime Type", color="Percentage"),
+                            x=crime_breakdown_pct.index,
+                            y=CRIME_TYPES,
+                            color_continuous_scale="Reds",
+                            title="Crime Type Distribution in Top Hotspots")
 
-    # Explain hotspot classification
-    st.write("**Hotspot Classification:**")
-    st.write("- Hotspot (Red): Jurisdictions with crime rates above the average")
-    st.write("- Not Hotspot (Blue): Jurisdictions with crime rates at or below the average")
-    st.write(f"- Average Crime Rate: {avg_crime_rate:.2f} per 100,000 inhabitants")
+    fig_heatmap.update_layout(xaxis_tickangle=-45)
+    return fig_heatmap
+
+def create_trend_chart(trend_data, budget=None):
+    """Create a Plotly line chart of total crime per year for each jurisdiction."""
+    trend_data = downsample(trend_data, 'Year', 'TotalCrime', series='Jurisdiction', budget=budget)
+    return px.line(trend_data, x='Year', y='TotalCrime', color='Jurisdiction',
+                   title="Total Crime Trend for Top 5 Hotspots",
+                   labels={'TotalCrime': 'Total Crimes', 'Year': 'Year'})
+
+def report(cube, num_hotspots=10, window=5):
+    """
+    Build the page's charts and tables with the default widget states, without Streamlit.
+    :param cube: CrimeCube.
+    :return: List of (heading, chart, table or text) sections.
+    """
+    total_crime_per_jurisdiction, avg_crime_rate = prepare_hotspots(cube)
+    top_hotspots = total_crime_per_jurisdiction.head(num_hotspots)
+    rates, hotspots, average, persistence = prepare_rolling_hotspots(cube, window)
+    year = int(rates.columns.max())
+    spatial = prepare_spatial_statistics(cube)
+    metric = SPATIAL_METRICS[0]
+    year_statistics = spatial.select(Metric=metric, Year=year).dropna(subset=['GiZ'])
+    return [
+        ("Crime Rate by Jurisdiction", create_hotspot_chart(total_crime_per_jurisdiction, avg_crime_rate)),
+        (f"Top {num_hotspots} Crime Hotspots", top_hotspots[['Jurisdiction', 'CrimeRate', 'TotalCrime', 'Population']]),
+        ("Crime Type Breakdown for Top Hotspots",
+         create_breakdown_heatmap(prepare_breakdown(cube, top_hotspots['Jurisdiction'].tolist()))),
+        ("Crime Trend for Top Hotspots", create_trend_chart(prepare_trend(cube, top_hotspots['Jurisdiction'].head().tolist()))),
+        (f"Hotspots in a Window of up to {window} Years to {year}",
+         create_year_hotspot_chart(prepare_year_hotspots(rates, hotspots, year), average[year], year, window)),
+        (f"Hotspot Persistence ({window}-year window)", persistence),
+        ("Spatial Hotspots", create_gi_chart(year_statistics, metric, year)),
+    ]
 
-    # Highlight the top hotspots
+@st.fragment
+def show_top_hotspots(cube, version, total_crime_per_jurisdiction):
+    """
+    Table and crime type breakdown of the top hotspots. Moving the slider reruns only this section.
+    :param cube: CrimeCube.
+    :param version: Dataset version the figures are cached under.
+    :param total_crime_per_jurisdiction: Output of prepare_hotspots, highest rate first.
+    """
     num_hotspots = st.slider("Select number of top hotspots to display", 5, 20, 10)
     st.subheader(f"Top {num_hotspots} Crime Hotspots:")
     top_hotspots = total_crime_per_jurisdiction.head(num_hotspots)
 
     # Format the data for display
-    top_hotspots_display = top_hotspots.copy()
-    top_hotspots_display['CrimeRate'] = top_hotspots_display['CrimeRate'].round(2)
-    top_hotspots_display['TotalCrime'] = top_hotspots_display['TotalCrime'].astype(int)
-    top_hotspots_display['Population'] = top_hotspots_display['Population'].astype(int)
+    top_hotspots_display = top_hotspots.round({'CrimeRate': 2}).astype({'TotalCrime': int, 'Population': int})
 
     st.table(top_hotspots_display[['Jurisdiction', 'CrimeRate', 'TotalCrime', 'Population']])
 
     # Crime type breakdown for top hotspots
     st.subheader("Crime Type Breakdown for Top Hotspots")
-    top_jurisdictions = top_hotspots['Jurisdiction'].tolist()
-    crime_breakdown = df[df['Jurisdiction'].isin(top_jurisdictions)].groupby('Jurisdiction')[crime_types].sum()
+    with profiling.stage('aggregate'):
+        crime_breakdown_pct = prepare_breakdown(cube, top_hotspots['Jurisdiction'].tolist())
+    with profiling.stage('charts'):
+        fig = cached_figure(('crime_hotspots', 'breakdown', version, num_hotspots),
+                            lambda: create_breakdown_heatmap(crime_breakdown_pct))
+        st.plotly_chart(fig, use_container_width=True)
 
-    # Normalize the crime counts to percentages
-    crime_breakdown_pct = crime_breakdown.div(crime_breakdown.sum(axis=1), axis=0) * 100
+@st.fragment
+def show_hotspots_over_time(cube, version):
+    """
+    Hotspots over a trailing window and spatial hotspots of the selected year.
+    The year slider drives both, so they rerun together without the rest of the page.
+    :param cube: CrimeCube.
+    :param version: Dataset version the results are cached under.
+    """
+    # Hotspot classification over a trailing window
+    st.subheader("Hotspots Over Time")
+    st.write("Classify jurisdictions year by year using only the most recent years, so recent hotspots are not hidden by the full-period average.")
+    window = st.select_slider("Trailing window (years)", options=WINDOW_OPTIONS, value=5)
+    with profiling.stage('aggregate'):
+        rates, hotspots, average, persistence = cached_result(('crime_hotspots', 'rolling', version, window),
+                                                              lambda: prepare_rolling_hotspots(cube, window))
+    year = st.slider("Year", int(rates.columns.min()), int(rates.columns.max()), int(rates.columns.max()))
+    with profiling.stage('charts'):
+        fig = cached_figure(('crime_hotspots', 'rolling', version, window, year),
+                            lambda: create_year_hotspot_chart(prepare_year_hotspots(rates, hotspots, year),
+                                                              average[year], year, window))
+        st.plotly_chart(fig, use_container_width=True)
 
-    # Create a heatmap for crime type breakdown
-    fig_heatmap = px.imshow(crime_breakdown_pct.T,
-                            labels=dict(x="Jurisdiction", y="Crime Type", color="Percentage"),
-                            x=crime_breakdown_pct.index,
-                            y=crime_types,
-                            color_continuous_scale="Reds",
-                            title="Crime Type Distribution in Top Hotspots")
+    st.write(f"**Hotspot Persistence ({window}-year window):**")
+    st.dataframe(persistence.style.format({'HotspotShare': '{:.1f}%'}), use_container_width=True, hide_index=True)
 
-    fig_heatmap.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig_heatmap, use_container_width=True)
+    # Spatial clustering of high rates among neighbouring jurisdictions
+    st.subheader("Spatial Hotspots")
+    st.write("Getis-Ord Gi* flags jurisdictions that, together with their neighbours, have significantly high "
+             f"(hot spot) or low (cold spot) rates in {year}. Neighbours are jurisdictions that share a boundary.")
+    metric = st.selectbox("Crime rate for the spatial analysis:", SPATIAL_METRICS)
+    with profiling.stage('aggregate'):
+        spatial = cached_result(('crime_hotspots', 'spatial', version), lambda: prepare_spatial_statistics(cube))
+        year_statistics = spatial.select(Metric=metric, Year=year).dropna(subset=['GiZ'])
+    with profiling.stage('charts'):
+        fig = cached_figure(('crime_hotspots', 'gi', version, metric, year),
+                            lambda: create_gi_chart(year_statistics, metric, year))
+        st.plotly_chart(fig, use_container_width=True)
+    spatial_hotspots = year_statistics.loc[year_statistics['GiClass'] == 'Hot Spot', 'Jurisdiction'].tolist()
+    st.write(f"- Spatial hot spots in {year}: {', '.join(spatial_hotspots) if spatial_hotspots else 'none'}")
+
+def show():
+    with profiling.stage('load'):
+        cube = get_cube()
+        version = dataset_version()
+    st.header("Crime Hotspots in Maryland")
+    st.write("Identify and analyze crime hotspots across different jurisdictions in Maryland to prioritize resource allocation.")
+
+    with profiling.stage('aggregate'):
+        total_crime_per_jurisdiction, avg_crime_rate = prepare_hotspots(cube)
+
+    # Create a bar chart to visualize the crime rate per jurisdiction
+    with profiling.stage('charts'):
+        fig = cached_figure(('crime_hotspots', 'rates', version),
+                            lambda: create_hotspot_chart(total_crime_per_jurisdiction, avg_crime_rate))
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Explain hotspot classification
+    st.write("**Hotspot Classification:**")
+    st.write("- Hotspot (Red): Jurisdictions with crime rates above the average")
+    st.write("- Not Hotspot (Blue): Jurisdictions with crime rates at or below the average")
+    st.write(f"- Average Crime Rate: {avg_crime_rate:.2f} per 100,000 inhabitants")
+
+    show_top_hotspots(cube, version, total_crime_per_jurisdiction)
 
     # Trend analysis for top hotspots
     st.subheader("Crime Rate Trend for Top Hotspots")
-    top_5_hotspots = top_hotspots['Jurisdiction'].head().tolist()
-    trend_data = df[df['Jurisdiction'].isin(top_5_hotspots)]
+    # The top five are in every slider selection, whose minimum is five, so they stay outside the fragment
+    top_hotspots = total_crime_per_jurisdiction.head()
+    with profiling.stage('charts'):
+        fig = cached_figure(('crime_hotspots', 'trend', version),
+                            lambda: create_trend_chart(prepare_trend(cube, top_hotspots['Jurisdiction'].tolist())))
+        st.plotly_chart(fig, use_container_width=True)
 
-    fig_trend = px.line(trend_data, x='Year', y='TotalCrime', color='Jurisdiction',
-                        title="Total Crime Trend for Top 5 Hotspots",
-                        labels={'TotalCrime': 'Total Crimes', 'Year': 'Year'})
-    st.plotly_chart(fig_trend, use_container_width=True)
+    show_hotspots_over_time(cube, version)
 
     # Resource allocation recommendation
     st.subheader("Resource Allocation Recommendations:")
     st.write("Based on the analysis, we recommend prioritizing the following areas for increased policing and resource allocation:")
 
-    for i, (_, hotspot) in enumerate(top_hotspots.head().iterrows(), 1):
+    with profiling.stage('aggregate'):
+        crime_breakdown_pct = prepare_breakdown(cube, top_hotspots['Jurisdiction'].tolist())
+    for i, (_, hotspot) in enumerate(top_hotspots.iterrows(), 1):
         dominant_crime = crime_breakdown_pct.loc[hotspot['Jurisdiction']].idxmax()
         st.write(f"{i}. {hotspot['Jurisdiction']}:")
         st.write(f"   - Crime Rate: {hotspot['CrimeRate']:.2f} per 100,000 inhabitants")
@@ -120,10 +282,5 @@ def show():
     st.write("4. The trend analysis for top hotspots can help in understanding whether the situation is improving or worsening over time.")
 
     # Allow users to download the data
-    csv = total_crime_per_jurisdiction.to_csv(index=False)
-    st.download_button(
-        label="Download crime hotspots data as CSV",
-        data=csv,
-        file_name="crime_hotspots_maryland.csv",
-        mime="text/csv",
-    )
+    with profiling.stage('export'):
+        download_buttons("crime hotspots data", "crime_hotspots_maryland", ('crime_hotspots',), lambda: total_crime_per_jurisdiction)
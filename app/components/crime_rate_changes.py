@@ -2,18 +2,13 @@ import streamlit as st
 import altair as alt
 import pandas as pd
 import numpy as np
-from app.data.data_loader import load_data
+from app.data.data_loader import dataset_version, derived_metrics, get_derived
+from app.cache import cached_figure
+from app.config import PCT_CHANGE_CAP
+from app.components.downloads import download_buttons
+from app import profiling
 
-def calculate_capped_pct_change(series, cap=10):
-    """Calculate percentage change with capping for extreme values."""
-    pct_change = series.pct_change()
-    return pct_change.clip(lower=-cap, upper=cap)
-
-def prepare_data(df, crime_types):
-    """Prepare data for analysis and visualization."""
-    crime_data = df[crime_types + ['Year']].groupby('Year').sum()
-    crime_data_pct_change = crime_data.apply(calculate_capped_pct_change).reset_index().melt('Year', var_name='Crime Type', value_name='Pct Change')
-    return crime_data_pct_change.dropna()
+CRIME_TYPES = ['MurderPer100k', 'RapePer100k', 'RobberyPer100k', 'AggAssaultPer100k', 'BreakAndEnterPer100k', 'LarcenyTheftPer100k', 'MotorVehicleTheftPer100k']
 
 def create_line_chart(data):
     """Create an Altair line chart for crime rate changes."""
@@ -36,16 +31,15 @@ def format_pct_change(value):
     """Format percentage change, handling extreme values."""
     if pd.isna(value):
         return 'N/A'
-    elif value == 10:  # Our cap value
-        return '>1000%'
-    elif value == -10:  # Our negative cap value
-        return '<-1000%'
+    elif value == PCT_CHANGE_CAP:
+        return f'>{PCT_CHANGE_CAP:.0%}'
+    elif value == -PCT_CHANGE_CAP:
+        return f'<-{PCT_CHANGE_CAP:.0%}'
     else:
         return f'{value:.2%}'
 
 def show_top_changes(data, top_n=5):
     """Display top increases and decreases in crime rates."""
-    data['Absolute Change'] = data['Pct Change'].abs()
     top_increases = data.nlargest(top_n, 'Pct Change')
     top_decreases = data.nsmallest(top_n, 'Pct Change')
 
@@ -55,20 +49,32 @@ def show_top_changes(data, top_n=5):
     st.write(f"### Top {top_n} Decreases in Crime Rates")
     st.table(top_decreases[['Year', 'Crime Type', 'Pct Change']].style.format({'Pct Change': format_pct_change}))
 
-def show():
-    st.header("Crime Rate Changes Analysis in Maryland")
-    st.write("Analyze the most significant increases or decreases in crime rates for different types of crimes in Maryland over the years.")
-
-    # Load and prepare data
-    df = load_data('app/data/cleaned_MD_Crime_Data.csv')
-    crime_types = ['MurderPer100k', 'RapePer100k', 'RobberyPer100k', 'AggAssaultPer100k', 'BreakAndEnterPer100k', 'LarcenyTheftPer100k', 'MotorVehicleTheftPer100k']
-    crime_data_pct_change = prepare_data(df, crime_types)
+def report(cube, top_n=5):
+    """
+    Build the page's charts and tables with the default widget states, without Streamlit.
+    :param cube: CrimeCube.
+    :return: List of (heading, chart, table or text) sections.
+    """
+    crime_data_pct_change = derived_metrics(cube).changes(CRIME_TYPES)
+    filtered_data = crime_data_pct_change[crime_data_pct_change['Crime Type'].isin(CRIME_TYPES[:2])]
+    return [
+        ("Percentage Change in Crime Rates", create_line_chart(filtered_data)),
+        (f"Top {top_n} Increases in Crime Rates", crime_data_pct_change.nlargest(top_n, 'Pct Change')),
+        (f"Top {top_n} Decreases in Crime Rates", crime_data_pct_change.nsmallest(top_n, 'Pct Change')),
+    ]
 
+@st.fragment
+def show_rate_changes(crime_data_pct_change, version):
+    """
+    Chart and top changes of the selected crime rates. Changing the selection reruns only this section.
+    :param crime_data_pct_change: Capped changes of every crime rate in long format.
+    :param version: Dataset version the figures are cached under.
+    """
     # User interface for crime type selection
     selected_crimes = st.multiselect(
         "Select crime types to display:",
-        options=crime_types,
-        default=crime_types[:2]
+        options=CRIME_TYPES,
+        default=CRIME_TYPES[:2]
     )
 
     if not selected_crimes:
@@ -79,17 +85,27 @@ def show():
     filtered_data = crime_data_pct_change[crime_data_pct_change['Crime Type'].isin(selected_crimes)]
 
     # Display line chart
-    line_chart = create_line_chart(filtered_data)
-    st.altair_chart(line_chart, use_container_width=True)
+    with profiling.stage('charts'):
+        line_chart = cached_figure(('crime_rate_changes', 'pct_change', version, tuple(selected_crimes)),
+                                   lambda: create_line_chart(filtered_data))
+        st.altair_chart(line_chart, use_container_width=True)
 
     # Show top changes
     show_top_changes(filtered_data)
 
+def show():
+    st.header("Crime Rate Changes Analysis in Maryland")
+    st.write("Analyze the most significant increases or decreases in crime rates for different types of crimes in Maryland over the years.")
+
+    # Load and prepare data
+    with profiling.stage('load'):
+        derived = get_derived()
+        version = dataset_version()
+    with profiling.stage('aggregate'):
+        crime_data_pct_change = derived.changes(CRIME_TYPES)
+
+    show_rate_changes(crime_data_pct_change, version)
+
     # Data download option
-    csv = crime_data_pct_change.to_csv(index=False)
-    st.download_button(
-        label="Download crime rate changes data as CSV",
-        data=csv,
-        file_name="maryland_crime_rate_changes.csv",
-        mime="text/csv",
-    )
+    with profiling.stage('export'):
+        download_buttons("crime rate changes data", "maryland_crime_rate_changes", ('crime_rate_changes',), lambda: crime_data_pct_change)
@@ -0,0 +1,43 @@
+import os
+import streamlit as st
+from app.data.data_loader import data_path
+from app.data.export import FORMATS, cached_export, raw_extract_path
+
+def download_buttons(label, file_name, key, build_frame):
+    """
+    Offer a page's data for download in every export format.
+    Nothing is serialized until a button is clicked, and the payload is then
+    cached per dataset version, selection and format.
+    :param label: Description of the data, e.g. "crime hotspots data".
+    :param file_name: File name without extension.
+    :param key: Tuple of the export name and the widget values the data depends on.
+    :param build_frame: Callable without arguments that returns the DataFrame to export.
+    """
+    columns = st.columns(len(FORMATS))
+    for column, (fmt, (extension, mime)) in zip(columns, FORMATS.items()):
+        column.download_button(
+            label=f"Download {label} as {fmt}",
+            data=lambda fmt=fmt: cached_export(key, build_frame, fmt),
+            file_name=f"{file_name}{extension}",
+            mime=mime,
+            on_click="ignore",
+            key=f"download-{'-'.join(map(str, key))}-{fmt}",
+        )
+
+def _read_raw_extract(fmt):
+    with open(raw_extract_path(fmt), 'rb') as f:
+        return f.read()
+
+def raw_extract_buttons():
+    """Offer the full raw dataset in every export format from the sidebar."""
+    st.sidebar.subheader("Full Raw Extract")
+    stem = os.path.splitext(os.path.basename(data_path()))[0]
+    for fmt, (extension, mime) in FORMATS.items():
+        st.sidebar.download_button(
+            label=f"Download full dataset as {fmt}",
+            data=lambda fmt=fmt: _read_raw_extract(fmt),
+            file_name=f"{stem}{extension}",
+            mime=mime,
+            on_click="ignore",
+            key=f"download-raw-{fmt}",
+        )
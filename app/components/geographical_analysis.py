@@ -2,26 +2,20 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-from app.data.data_loader import load_data
-
-def show():
-    st.header("Geographical Analysis of Crime Rates in Maryland")
-    st.write("Explore crime rates across different jurisdictions in Maryland and compare them to the state average.")
-
-    # Load data
-    df = load_data('app/data/cleaned_MD_Crime_Data.csv')
-
-    # Define crime types
-    crime_types = ['MurderPer100k', 'RapePer100k', 'RobberyPer100k', 'AggAssaultPer100k',
-                   'BreakAndEnterPer100k', 'LarcenyTheftPer100k', 'MotorVehicleTheftPer100k']
-
-    # Calculate total crime rate
-    df['TotalCrimeRate'] = df[crime_types].sum(axis=1)
-
-    # Calculate average crime rates by jurisdiction
-    avg_crime_rates = df.groupby('Jurisdiction').agg({
-        'TotalCrimeRate': 'mean',
-        'Population': 'mean'
+from app.analysis.spatial import load_adjacency, local_statistics, weight_matrix
+from app.data.data_loader import dataset_version, get_cube
+from app.cache import cached_figure
+from app.components.downloads import download_buttons
+from app import profiling
+
+CRIME_TYPES = ['MurderPer100k', 'RapePer100k', 'RobberyPer100k', 'AggAssaultPer100k',
+               'BreakAndEnterPer100k', 'LarcenyTheftPer100k', 'MotorVehicleTheftPer100k']
+
+def prepare_jurisdiction_rates(cube):
+    """Average total crime rate per jurisdiction compared to the state average."""
+    avg_crime_rates = pd.DataFrame({
+        'TotalCrimeRate': cube.jurisdiction_mean[CRIME_TYPES].sum(axis=1),
+        'Population': cube.jurisdiction_mean['Population']
     }).reset_index()
 
     # Calculate state average crime rate
@@ -33,8 +27,16 @@ def show():
 
     # Sort jurisdictions by crime rate
     avg_crime_rates = avg_crime_rates.sort_values('TotalCrimeRate', ascending=False)
+    return avg_crime_rates, state_avg_crime_rate
 
-    # Create bar chart
+def prepare_spatial_clusters(avg_crime_rates):
+    """Getis-Ord Gi* and local Moran's I of the average crime rates against the county adjacency."""
+    rates = avg_crime_rates.set_index('Jurisdiction')[['TotalCrimeRate']]
+    clusters = local_statistics(rates, weight_matrix(rates.index, load_adjacency()))
+    return clusters.drop(columns='Variable').rename(columns={'Value': 'TotalCrimeRate'}).sort_values('GiZ', ascending=False)
+
+def create_rate_bar_chart(avg_crime_rates, state_avg_crime_rate):
+    """Create a Plotly bar chart of the average crime rate per jurisdiction."""
     fig = px.bar(avg_crime_rates,
                  x='Jurisdiction',
                  y='TotalCrimeRate',
@@ -48,7 +50,51 @@ def show():
                   annotation_text="State Average", annotation_position="bottom right")
 
     fig.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+def create_rate_scatter(avg_crime_rates, state_avg_crime_rate):
+    """Create a Plotly scatter plot of crime rate against population."""
+    fig_scatter = px.scatter(avg_crime_rates, x='Population', y='TotalCrimeRate',
+                             hover_name='Jurisdiction', size='Population', color='DiffFromStateAvg',
+                             color_continuous_scale='RdYlGn_r',
+                             title='Crime Rate vs Population by Jurisdiction')
+
+    fig_scatter.add_hline(y=state_avg_crime_rate, line_dash="dash", line_color="red",
+                          annotation_text="State Average", annotation_position="bottom right")
+    return fig_scatter
+
+def report(cube):
+    """
+    Build the page's charts and tables without Streamlit.
+    :param cube: CrimeCube.
+    :return: List of (heading, chart, table or text) sections.
+    """
+    avg_crime_rates, state_avg_crime_rate = prepare_jurisdiction_rates(cube)
+    return [
+        ("Average Crime Rates by Jurisdiction", create_rate_bar_chart(avg_crime_rates, state_avg_crime_rate)),
+        ("Top 5 Jurisdictions by Crime Rate", avg_crime_rates.head()),
+        ("Bottom 5 Jurisdictions by Crime Rate", avg_crime_rates.tail()),
+        ("Crime Rate vs Population", create_rate_scatter(avg_crime_rates, state_avg_crime_rate)),
+        ("Spatial Clusters", prepare_spatial_clusters(avg_crime_rates)),
+        ("State Average", f"The state average crime rate is {state_avg_crime_rate:.2f} crimes per 100,000 population."),
+    ]
+
+def show():
+    st.header("Geographical Analysis of Crime Rates in Maryland")
+    st.write("Explore crime rates across different jurisdictions in Maryland and compare them to the state average.")
+
+    # Load data
+    with profiling.stage('load'):
+        cube = get_cube()
+        version = dataset_version()
+    with profiling.stage('aggregate'):
+        avg_crime_rates, state_avg_crime_rate = prepare_jurisdiction_rates(cube)
+
+    # Create bar chart
+    with profiling.stage('charts'):
+        fig = cached_figure(('geographical_analysis', 'rates', version),
+                            lambda: create_rate_bar_chart(avg_crime_rates, state_avg_crime_rate))
+        st.plotly_chart(fig, use_container_width=True)
 
     # Display top and bottom jurisdictions
     col1, col2 = st.columns(2)
@@ -71,15 +117,20 @@ def show():
         }))
 
     # Create scatter plot
-    fig_scatter = px.scatter(avg_crime_rates, x='Population', y='TotalCrimeRate',
-                             hover_name='Jurisdiction', size='Population', color='DiffFromStateAvg',
-                             color_continuous_scale='RdYlGn_r',
-                             title='Crime Rate vs Population by Jurisdiction')
-
-    fig_scatter.add_hline(y=state_avg_crime_rate, line_dash="dash", line_color="red",
-                          annotation_text="State Average", annotation_position="bottom right")
-
-    st.plotly_chart(fig_scatter, use_container_width=True)
+    with profiling.stage('charts'):
+        fig = cached_figure(('geographical_analysis', 'scatter', version),
+                            lambda: create_rate_scatter(avg_crime_rates, state_avg_crime_rate))
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Spatial clusters
+    st.subheader("Spatial Clusters")
+    st.write("Jurisdictions whose neighbours share their crime level. Getis-Ord Gi* marks significant hot and cold "
+             "spots, and the local Moran's I quadrant shows whether a jurisdiction and its neighbours are both high, "
+             "both low, or differ.")
+    with profiling.stage('aggregate'):
+        clusters = prepare_spatial_clusters(avg_crime_rates)
+    st.dataframe(clusters.style.format({'TotalCrimeRate': '{:.2f}', 'GiZ': '{:.2f}', 'GiPValue': '{:.4f}', 'MoranI': '{:.3f}'}),
+                 use_container_width=True, hide_index=True)
 
     # Additional insights
     st.subheader("Key Insights")
@@ -105,10 +156,5 @@ def show():
              "with more populous jurisdictions generally having higher crime rates.")
 
     # Allow users to download the data
-    csv = avg_crime_rates.to_csv(index=False)
-    st.download_button(
-        label="Download crime rate data as CSV",
-        data=csv,
-        file_name="maryland_crime_rates_by_jurisdiction.csv",
-        mime="text/csv",
-    )
+    with profiling.stage('export'):
+        download_buttons("crime rate data", "maryland_crime_rates_by_jurisdiction", ('geographical_analysis',), lambda: avg_crime_rates)
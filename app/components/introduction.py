@@ -24,6 +24,7 @@ def show():
     * **Population Correlation:** The relationship between population size and crime rates in different areas.
     * **Crime Rate Changes:** The most significant increases or decreases in crime rates for different types of crimes.
     * **Crime Hotspots:** Identification of areas with high crime concentration for targeted interventions.
+    * **Crime Reduction Forecast:** Five-year projections of crime rates and the gap to the 10% reduction goal.
 
     This data-driven approach can guide effective resource allocation and crime prevention strategies to enhance public safety in Maryland.
 
@@ -1,14 +1,70 @@
+import importlib
+import os
+import subprocess
+import sys
+import time
 import streamlit as st
 
+# Page label -> component module. Modules are imported only when their page is selected.
+PAGES = {
+    "Introduction": "app.components.introduction",
+    "Trend Analysis": "app.components.trend_analysis",
+    "Crime Distribution": "app.components.crime_distribution",
+    "Geographical Analysis": "app.components.geographical_analysis",
+    "Population Correlation": "app.components.population_correlation",
+    "Crime Hotspots": "app.components.crime_hotspots",
+    "Crime Rate Changes": "app.components.crime_rate_changes",
+    "Crime Reduction Forecast": "app.components.reduction_forecast",
+}
+
+# Seconds spent importing each page in this process
+_import_times = {}
+
 def sidebar():
     st.sidebar.title("")
-    options = [
-        "Introduction",
-        "Trend Analysis",
-        "Crime Distribution",
-        "Geographical Analysis",
-        "Population Correlation",
-        "Crime Hotspots",
-        "Crime Rate Changes"
-    ]
-    return st.sidebar.radio("Go to", options)
+    return st.sidebar.radio("Go to", list(PAGES))
+
+def load_page(choice):
+    """
+    Import the component module of a page on first use.
+    :param choice: Page label as returned by sidebar().
+    :return: The component module.
+    """
+    module_name = PAGES[choice]
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _import_times[choice] = time.perf_counter() - start
+    return module
+
+def import_times():
+    """
+    Report how long each page imported so far took in this process.
+    Later pages look cheaper when an earlier page already imported a shared dependency.
+    :return: Dictionary of page label to seconds.
+    """
+    return dict(_import_times)
+
+def import_cost_report():
+    """
+    Measure the cold import cost of every page in a fresh interpreter.
+    Streamlit is imported before timing starts, since every script run pays for it anyway.
+    :return: Dictionary of page label to seconds.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')]))}
+    report = {}
+    for choice, module_name in PAGES.items():
+        code = ("import importlib, time, streamlit\n"
+                "start = time.perf_counter()\n"
+                f"importlib.import_module({module_name!r})\n"
+                "print(time.perf_counter() - start)")
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                check=True, cwd=root, env=env).stdout
+        report[choice] = float(output.strip().splitlines()[-1])
+    return report
+
+if __name__ == "__main__":
+    for choice, seconds in import_cost_report().items():
+        print(f"{choice:<25} {seconds * 1000:8.1f} ms")
@@ -1,53 +1,69 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from scipy import stats
-from app.data.data_loader import load_data
-
-def calculate_correlation(x, y):
-    return stats.pearsonr(x, y)[0]
-
-def show():
-    st.header("Population and Crime Rate Correlation Analysis in Maryland")
-    st.write("Explore the relationship between population size and various crime rates across different jurisdictions in Maryland.")
-
-    # Load data
-    df = load_data('app/data/cleaned_MD_Crime_Data.csv')
-
-    # Define columns of interest
-    crime_types = ['MurderPer100k', 'RapePer100k', 'RobberyPer100k', 'AggAssaultPer100k',
-                   'BreakAndEnterPer100k', 'LarcenyTheftPer100k', 'MotorVehicleTheftPer100k']
-
-    # Calculate average crime rates and population for each jurisdiction
-    avg_data = df.groupby('Jurisdiction')[['Population'] + crime_types].mean().reset_index()
-
-    # Calculate correlation coefficients
-    correlations = [calculate_correlation(avg_data['Population'], avg_data[crime]) for crime in crime_types]
-    correlation_df = pd.DataFrame({'Crime Type': crime_types, 'Correlation': correlations})
-    correlation_df = correlation_df.sort_values('Correlation', ascending=False)
-
-    # Create correlation bar chart
+from app.analysis.bootstrap import correlation_uncertainty
+from app.analysis.regression import fitted_line, linear_fits, yearly_fits
+from app.data.data_loader import dataset_version, get_cube
+from app.cache import cached_figure, cached_result
+from app.config import BOOTSTRAP_RESAMPLES
+from app.components.downloads import download_buttons
+from app import profiling
+
+CRIME_TYPES = ['MurderPer100k', 'RapePer100k', 'RobberyPer100k', 'AggAssaultPer100k',
+               'BreakAndEnterPer100k', 'LarcenyTheftPer100k', 'MotorVehicleTheftPer100k']
+
+def prepare_averages(cube):
+    """Average population and crime rates per jurisdiction."""
+    return cube.jurisdiction_mean[['Population'] + CRIME_TYPES].reset_index()
+
+def prepare_fits(avg_data):
+    """Correlation and linear regression of every crime rate on population, in one pass."""
+    return linear_fits(avg_data['Population'], avg_data[CRIME_TYPES])
+
+def prepare_uncertainty(avg_data, n_resamples=BOOTSTRAP_RESAMPLES):
+    """Bootstrap confidence intervals and permutation p-values of each crime rate's correlation with population."""
+    return correlation_uncertainty(avg_data['Population'], avg_data[CRIME_TYPES], n_resamples=n_resamples)
+
+def prepare_correlations(fits, uncertainty):
+    """Pearson correlation of population with each crime rate and its 95% confidence interval, strongest first."""
+    correlation_df = pd.DataFrame({'Crime Type': CRIME_TYPES,
+                                   'Correlation': fits.loc[CRIME_TYPES, 'r'].to_numpy(),
+                                   'CI Low': uncertainty.loc[CRIME_TYPES, 'ci_low'].to_numpy(),
+                                   'CI High': uncertainty.loc[CRIME_TYPES, 'ci_high'].to_numpy()})
+    return correlation_df.sort_values('Correlation', ascending=False)
+
+def prepare_yearly_correlations(cube):
+    """Pearson correlation of population with each crime rate across jurisdictions, per year."""
+    return yearly_fits(cube, 'Population', CRIME_TYPES)['r'].rename('Correlation').reset_index()
+
+def create_correlation_chart(correlation_df):
+    """Create a Plotly bar chart of the correlation coefficients."""
     fig_corr = px.bar(correlation_df, x='Crime Type', y='Correlation',
-                      title='Correlation between Population and Crime Rates',
+                      title='Correlation between Population and Crime Rates (with 95% bootstrap intervals)',
                       labels={'Correlation': 'Pearson Correlation Coefficient'},
+                      error_y=correlation_df['CI High'] - correlation_df['Correlation'],
+                      error_y_minus=correlation_df['Correlation'] - correlation_df['CI Low'],
                       color='Correlation',
                       color_continuous_scale='RdBu_r',
                       range_color=[-1, 1])
     fig_corr.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig_corr, use_container_width=True)
+    return fig_corr
 
-    st.write("This chart shows the correlation coefficients between population and various crime rates. "
-             "A value close to 1 indicates a strong positive correlation, while a value close to -1 indicates "
-             "a strong negative correlation. Values close to 0 suggest weak or no correlation.")
+def create_yearly_correlation_chart(yearly_correlations):
+    """Create a Plotly line chart of the correlation coefficients per year."""
+    fig = px.line(yearly_correlations, x='Year', y='Correlation', color='Metric',
+                  title='Correlation between Population and Crime Rates by Year',
+                  labels={'Correlation': 'Pearson Correlation Coefficient', 'Metric': 'Crime Type'})
+    fig.update_yaxes(range=[-1, 1])
+    return fig
 
-    # Scatter plots for each crime type
-    st.subheader("Detailed Analysis: Population vs Crime Rates")
-    fig = make_subplots(rows=3, cols=3, subplot_titles=crime_types)
+def create_scatter_grid(avg_data, fits):
+    """Create a 3x3 grid of population vs crime rate scatter plots with trendlines."""
+    fig = make_subplots(rows=3, cols=3, subplot_titles=CRIME_TYPES)
 
-    for i, crime_type in enumerate(crime_types, 1):
+    for i, crime_type in enumerate(CRIME_TYPES, 1):
         row = (i - 1) // 3 + 1
         col = (i - 1) % 3 + 1
 
@@ -59,10 +75,9 @@ def show():
         )
 
         # Add trendline
-        z = np.polyfit(avg_data['Population'], avg_data[crime_type], 1)
-        y_fit = np.poly1d(z)(avg_data['Population'])
+        x_fit, y_fit = fitted_line(fits.loc[crime_type])
         fig.add_trace(
-            go.Scatter(x=avg_data['Population'], y=y_fit, mode='lines',
+            go.Scatter(x=x_fit, y=y_fit, mode='lines',
                        name=f'Trendline ({crime_type})', line=dict(color='red', dash='dash')),
             row=row, col=col
         )
@@ -71,29 +86,115 @@ def show():
         fig.update_yaxes(title_text="Rate per 100k", row=row, col=col)
 
     fig.update_layout(height=1200, width=1000, title_text="Population vs Crime Rates Scatter Plots")
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+def create_regression_chart(avg_data, selected_crime, fit):
+    """Create a Plotly scatter plot with the fitted regression line for one crime rate."""
+    fig = px.scatter(avg_data, x='Population', y=selected_crime,
+                     hover_data=['Jurisdiction'],
+                     labels={'Population': 'Population', selected_crime: f'{selected_crime} (per 100k)'},
+                     title=f'Linear Regression: Population vs {selected_crime}')
+    x_fit, y_fit = fitted_line(fit)
+    fig.add_trace(go.Scatter(x=x_fit, y=y_fit, mode='lines', line=dict(color='red'), name='OLS trendline',
+                             hovertemplate=f"{selected_crime} = {fit['slope']:.6g} * Population + {fit['intercept']:.6g}"
+                                           f"<br>R<sup>2</sup>={fit['r2']:.6f}<extra></extra>"))
+    return fig
+
+def report(cube):
+    """
+    Build the page's charts and tables with the default widget states, without Streamlit.
+    :param cube: CrimeCube.
+    :return: List of (heading, chart, table or text) sections.
+    """
+    avg_data = prepare_averages(cube)
+    fits = prepare_fits(avg_data)
+    uncertainty = prepare_uncertainty(avg_data)
+    selected_crime = CRIME_TYPES[0]
+    return [
+        ("Correlation between Population and Crime Rates", create_correlation_chart(prepare_correlations(fits, uncertainty))),
+        ("Correlation by Year", create_yearly_correlation_chart(prepare_yearly_correlations(cube))),
+        ("Population vs Crime Rates", create_scatter_grid(avg_data, fits)),
+        ("Linear Regression Analysis", create_regression_chart(avg_data, selected_crime, fits.loc[selected_crime])),
+        ("Regression and Bootstrap Statistics", fits.join(uncertainty.drop(columns='r')).rename_axis('Crime Type').reset_index()),
+    ]
+
+@st.fragment
+def show_regression(avg_data, fits, uncertainty, version):
+    """
+    Regression chart and statistics of the selected crime rate. Changing the selection reruns only this section.
+    :param avg_data: Output of prepare_averages.
+    :param fits: Output of prepare_fits.
+    :param uncertainty: Output of prepare_uncertainty.
+    :param version: Dataset version the figures are cached under.
+    """
+    selected_crime = st.selectbox("Select a crime type for detailed regression analysis:", CRIME_TYPES)
+
+    fit = fits.loc[selected_crime]
+
+    with profiling.stage('charts'):
+        fig = cached_figure(('population_correlation', 'regression', version, selected_crime),
+                            lambda: create_regression_chart(avg_data, selected_crime, fit))
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.write(f"R-squared value: {fit['r2']:.4f}")
+    st.write(f"p-value: {fit['p_value']:.4f}")
+    st.write(f"Permutation p-value: {uncertainty.loc[selected_crime, 'perm_p_value']:.4f} "
+             f"({BOOTSTRAP_RESAMPLES:,} permutations)")
+    st.write(f"95% bootstrap interval of the correlation: "
+             f"[{uncertainty.loc[selected_crime, 'ci_low']:.3f}, {uncertainty.loc[selected_crime, 'ci_high']:.3f}]")
+
+    # The permutation test does not assume normally distributed rates, which matters with so few jurisdictions
+    if uncertainty.loc[selected_crime, 'perm_p_value'] < 0.05:
+        st.write("The relationship between population and this crime rate is statistically significant.")
+    else:
+        st.write("There is no statistically significant relationship between population and this crime rate.")
 
-    # Linear regression analysis
-    st.subheader("Linear Regression Analysis")
-    selected_crime = st.selectbox("Select a crime type for detailed regression analysis:", crime_types)
+def show():
+    st.header("Population and Crime Rate Correlation Analysis in Maryland")
+    st.write("Explore the relationship between population size and various crime rates across different jurisdictions in Maryland.")
 
-    slope, intercept, r_value, p_value, std_err = stats.linregress(avg_data['Population'], avg_data[selected_crime])
+    # Load data
+    with profiling.stage('load'):
+        cube = get_cube()
+        version = dataset_version()
 
-    fig_regression = px.scatter(avg_data, x='Population', y=selected_crime,
-                                trendline='ols', trendline_color_override='red',
-                                hover_data=['Jurisdiction'],
-                                labels={'Population': 'Population', selected_crime: f'{selected_crime} (per 100k)'},
-                                title=f'Linear Regression: Population vs {selected_crime}')
+    # Calculate average crime rates and population for each jurisdiction
+    with profiling.stage('aggregate'):
+        avg_data = prepare_averages(cube)
 
-    st.plotly_chart(fig_regression, use_container_width=True)
+    # Correlation and regression statistics of every crime rate, shared by all charts below
+    with profiling.stage('aggregate'):
+        fits = prepare_fits(avg_data)
+        uncertainty = cached_result(('population_correlation', 'uncertainty', version, BOOTSTRAP_RESAMPLES),
+                                    lambda: prepare_uncertainty(avg_data))
+        correlation_df = prepare_correlations(fits, uncertainty)
 
-    st.write(f"R-squared value: {r_value**2:.4f}")
-    st.write(f"p-value: {p_value:.4f}")
+    # Create correlation bar chart
+    with profiling.stage('charts'):
+        fig = cached_figure(('population_correlation', 'correlation', version),
+                            lambda: create_correlation_chart(correlation_df))
+        st.plotly_chart(fig, use_container_width=True)
 
-    if p_value < 0.05:
-        st.write("The relationship between population and this crime rate is statistically significant.")
-    else:
-        st.write("There is no statistically significant relationship between population and this crime rate.")
+    st.write("This chart shows the correlation coefficients between population and various crime rates. "
+             "A value close to 1 indicates a strong positive correlation, while a value close to -1 indicates "
+             "a strong negative correlation. Values close to 0 suggest weak or no correlation. "
+             f"Error bars are 95% percentile intervals from {BOOTSTRAP_RESAMPLES:,} bootstrap resamples of the jurisdictions.")
+
+    # Correlation coefficients per year
+    with profiling.stage('charts'):
+        fig = cached_figure(('population_correlation', 'yearly_correlation', version),
+                            lambda: create_yearly_correlation_chart(prepare_yearly_correlations(cube)))
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Scatter plots for each crime type
+    st.subheader("Detailed Analysis: Population vs Crime Rates")
+    with profiling.stage('charts'):
+        fig = cached_figure(('population_correlation', 'scatter_grid', version), lambda: create_scatter_grid(avg_data, fits))
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Linear regression analysis
+    st.subheader("Linear Regression Analysis")
+    show_regression(avg_data, fits, uncertainty, version)
 
     # Additional insights
     st.subheader("Key Insights")
@@ -106,10 +207,6 @@ def show():
              "to determine the underlying causes of variations in crime rates.")
 
     # Allow users to download the data
-    csv = avg_data.to_csv(index=False)
-    st.download_button(
-        label="Download average crime rates by jurisdiction as CSV",
-        data=csv,
-        file_name="maryland_avg_crime_rates_by_jurisdiction.csv",
-        mime="text/csv",
-    )
+    with profiling.stage('export'):
+        download_buttons("average crime rates by jurisdiction", "maryland_avg_crime_rates_by_jurisdiction",
+                         ('population_correlation',), lambda: avg_data)
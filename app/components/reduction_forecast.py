@@ -0,0 +1,116 @@
+import streamlit as st
+import plotly.graph_objects as go
+from app.analysis.forecast import STATEWIDE, reduction_forecast
+from app.data.data_loader import dataset_version, get_cube
+from app.cache import cached_figure, cached_result
+from app.components.downloads import download_buttons
+from app.config import FORECAST_HORIZON, REDUCTION_TARGET
+from app import profiling
+
+METRICS = ['OverallCrimeRatePer100k', 'ViolentCrimeRatePer100k', 'PropertyCrimeRatePer100k',
+           'MurderPer100k', 'RapePer100k', 'RobberyPer100k', 'AggAssaultPer100k',
+           'BreakAndEnterPer100k', 'LarcenyTheftPer100k', 'MotorVehicleTheftPer100k']
+
+def prepare_forecast(cube, metric, workers=None):
+    """Five-year projections of a crime rate for every jurisdiction and the state, against the reduction path."""
+    return reduction_forecast(cube, metric, workers=workers)
+
+def prepare_summary(projections):
+    """Projection, reduction path and gap of each jurisdiction in the final year, furthest off track first."""
+    final = projections[projections['Year'] == projections['Year'].max()]
+    summary = final[['Jurisdiction', 'Forecast', 'Lower', 'Upper', 'Target', 'Gap', 'GapPct']]
+    summary = summary.assign(**{'On Track': summary['Forecast'] <= summary['Target']})
+    return summary.sort_values('GapPct', ascending=False)
+
+def create_forecast_chart(history, projections, jurisdiction, metric):
+    """Create a Plotly chart of the history, projection, prediction interval and reduction path of one jurisdiction."""
+    past = history[history['Jurisdiction'] == jurisdiction]
+    future = projections[projections['Jurisdiction'] == jurisdiction]
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=future['Year'].tolist() + future['Year'].tolist()[::-1],
+                             y=future['Upper'].tolist() + future['Lower'].tolist()[::-1],
+                             fill='toself', fillcolor='rgba(31, 119, 180, 0.2)', line=dict(width=0),
+                             name='95% Prediction Interval', hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=past['Year'], y=past['Value'], mode='lines+markers', name='Observed',
+                             line=dict(color='black')))
+    fig.add_trace(go.Scatter(x=future['Year'], y=future['Forecast'], mode='lines+markers', name='Forecast',
+                             line=dict(color='#1f77b4', dash='dash')))
+    fig.add_trace(go.Scatter(x=future['Year'], y=future['Target'], mode='lines', name=f'{REDUCTION_TARGET:.0%} Reduction Path',
+                             line=dict(color='green', dash='dot')))
+    fig.update_layout(title=f"{metric} Forecast for {jurisdiction}", xaxis_title='Year', yaxis_title=metric)
+    return fig
+
+def report(cube):
+    """
+    Build the page's charts and tables without Streamlit.
+    Runs in a report worker process, so the models are fitted in that process.
+    :param cube: CrimeCube.
+    :return: List of (heading, chart, table or text) sections.
+    """
+    metric = METRICS[0]
+    history, projections = prepare_forecast(cube, metric, workers=1)
+    return [
+        (f"{metric} Forecast for {STATEWIDE}", create_forecast_chart(history, projections, STATEWIDE, metric)),
+        (f"Gap to the {REDUCTION_TARGET:.0%} Reduction Goal", prepare_summary(projections)),
+    ]
+
+@st.fragment
+def show_forecast_chart(history, projections, jurisdictions, metric, version):
+    """
+    Forecast chart of the selected jurisdiction. Changing the jurisdiction reruns only this chart.
+    :param history: Observed rates, as returned by prepare_forecast.
+    :param projections: Projections of every jurisdiction, as returned by prepare_forecast.
+    :param jurisdictions: Jurisdictions to offer, statewide first.
+    :param metric: Forecast crime rate.
+    :param version: Dataset version the figures are cached under.
+    """
+    jurisdiction = st.selectbox("Jurisdiction:", jurisdictions)
+    with profiling.stage('charts'):
+        fig = cached_figure(('reduction_forecast', 'forecast', version, metric, jurisdiction),
+                            lambda: create_forecast_chart(history, projections, jurisdiction, metric))
+        st.plotly_chart(fig, use_container_width=True)
+
+def show():
+    st.header("Crime Reduction Forecast")
+    st.write(f"Project crime rates {FORECAST_HORIZON} years ahead and compare them with the goal of a "
+             f"{REDUCTION_TARGET:.0%} reduction. Each jurisdiction is fitted with a damped-trend exponential "
+             "smoothing model, and the reduction path falls evenly from its latest rate to the goal.")
+
+    with profiling.stage('load'):
+        cube = get_cube()
+        version = dataset_version()
+
+    metric = st.selectbox("Crime rate to forecast:", METRICS)
+    with profiling.stage('aggregate'):
+        history, projections = cached_result(('reduction_forecast', version, metric, FORECAST_HORIZON, REDUCTION_TARGET),
+                                             lambda: prepare_forecast(cube, metric))
+        summary = prepare_summary(projections)
+
+    jurisdictions = [STATEWIDE] + sorted(j for j in summary['Jurisdiction'] if j != STATEWIDE)
+    show_forecast_chart(history, projections, jurisdictions, metric, version)
+
+    final_year = int(projections['Year'].max())
+    statewide = summary[summary['Jurisdiction'] == STATEWIDE]
+    if not statewide.empty:
+        row = statewide.iloc[0]
+        col1, col2, col3 = st.columns(3)
+        col1.metric(f"{final_year} Forecast (statewide)", f"{row['Forecast']:.2f}")
+        col2.metric(f"{final_year} Reduction Goal", f"{row['Target']:.2f}")
+        col3.metric("Gap to Goal", f"{row['GapPct']:+.2f}%", delta_color="inverse")
+
+    st.subheader(f"Gap to the {REDUCTION_TARGET:.0%} Reduction Goal in {final_year}")
+    st.write("A positive gap means the projection is above the reduction path. Jurisdictions with fewer than "
+             "ten years of data are projected flat and have no interval.")
+    st.dataframe(summary, use_container_width=True, hide_index=True, column_config={
+        'Forecast': st.column_config.NumberColumn(format='%.2f'),
+        'Lower': st.column_config.NumberColumn(format='%.2f'),
+        'Upper': st.column_config.NumberColumn(format='%.2f'),
+        'Target': st.column_config.NumberColumn(format='%.2f'),
+        'Gap': st.column_config.NumberColumn(format='%+.2f'),
+        'GapPct': st.column_config.NumberColumn('Gap %', format='%+.2f%%'),
+    })
+    on_track = summary[summary['On Track'] & (summary['Jurisdiction'] != STATEWIDE)]
+    st.write(f"{len(on_track)} of {len(summary) - len(statewide)} jurisdictions are projected to meet the goal for {metric}.")
+
+    with profiling.stage('export'):
+        download_buttons("forecast data", "maryland_crime_forecast", ('reduction_forecast', metric), lambda: projections)
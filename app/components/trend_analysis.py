@@ -1,23 +1,45 @@
 import streamlit as st
 import altair as alt
 import pandas as pd
-from app.data.data_loader import load_data
-
-def show():
-    st.header("Crime Rate Trend Analysis in Maryland (1975-2020)")
-    st.write("Explore how overall and specific crime rates have changed over the years in Maryland.")
-
-    # Load data
-    df = load_data('app/data/cleaned_MD_Crime_Data.csv')
-
-    # Ensure 'Year' is datetime
-    df['Year'] = pd.to_datetime(df['Year'], format='%Y')
-
-    # Calculate overall crime rate
-    crime_rates = df.groupby('Year')['OverallCrimeRatePer100k'].mean().reset_index()
-
-    # Create overall trend chart
-    overall_chart = alt.Chart(crime_rates).mark_line(point=True).encode(
+from app.analysis.trends import jurisdiction_trends
+from app.data.data_loader import dataset_version, derived_metrics, get_cube, get_derived
+from app.cache import cached_figure, cached_result
+from app.data.downsample import downsample
+from app.components.downloads import download_buttons
+from app import profiling
+
+CRIME_TYPES = ['MurderPer100k', 'RapePer100k', 'RobberyPer100k', 'AggAssaultPer100k',
+               'BreakAndEnterPer100k', 'LarcenyTheftPer100k', 'MotorVehicleTheftPer100k']
+
+# Rates whose per-jurisdiction trends are tested
+TREND_METRICS = ['OverallCrimeRatePer100k'] + CRIME_TYPES
+
+# Crime types selected when the page opens
+DEFAULT_CRIMES = ['MurderPer100k', 'RobberyPer100k']
+
+def prepare_overall_trend(derived):
+    """Overall crime rate and its year-over-year percent change per year."""
+    crime_rates = derived.mean_rates[['OverallCrimeRatePer100k']].reset_index()
+    crime_rates['Year'] = pd.to_datetime(crime_rates['Year'], format='%Y')
+    crime_rates['PercentChange'] = derived.mean_rate_change['OverallCrimeRatePer100k'].to_numpy() * 100
+    return crime_rates
+
+def prepare_specific_trends(cube, selected_crimes):
+    """Mean rate per year of the selected crime types in long format."""
+    specific_crime_rates = cube.year_mean[selected_crimes].reset_index()
+    specific_crime_rates['Year'] = pd.to_datetime(specific_crime_rates['Year'], format='%Y')
+    return pd.melt(specific_crime_rates, id_vars=['Year'], value_vars=selected_crimes,
+                   var_name='Crime Type', value_name='Rate')
+
+def prepare_jurisdiction_trends(cube, start_year, end_year):
+    """Trend slope, Mann-Kendall significance and change point of every jurisdiction and crime rate, fastest rising first."""
+    trends = jurisdiction_trends(cube, TREND_METRICS, start_year, end_year)
+    return trends.sort_values('SenSlopePct', ascending=False, na_position='last')
+
+def create_overall_chart(crime_rates, budget=None):
+    """Create an Altair line chart of the overall crime rate."""
+    data = downsample(crime_rates, 'Year', 'OverallCrimeRatePer100k', budget=budget)
+    return alt.Chart(data).mark_line(point=True).encode(
         x=alt.X('Year:T', title='Year'),
         y=alt.Y('OverallCrimeRatePer100k:Q', title='Overall Crime Rate (per 100k)'),
         tooltip=['Year:T', alt.Tooltip('OverallCrimeRatePer100k:Q', format='.2f')]
@@ -25,10 +47,110 @@ def show():
         title='Overall Crime Rate Trend in Maryland (1975-2020)'
     ).interactive()
 
-    st.altair_chart(overall_chart, use_container_width=True)
+def create_specific_chart(specific_crime_rates, budget=None):
+    """Create an Altair line chart of the selected crime rates."""
+    data = downsample(specific_crime_rates, 'Year', 'Rate', series='Crime Type', budget=budget)
+    return alt.Chart(data).mark_line(point=True).encode(
+        x=alt.X('Year:T', title='Year'),
+        y=alt.Y('Rate:Q', title='Crime Rate (per 100k)'),
+        color='Crime Type:N',
+        tooltip=['Year:T', 'Crime Type:N', alt.Tooltip('Rate:Q', format='.2f')]
+    ).properties(
+        title='Specific Crime Rate Trends in Maryland (1975-2020)'
+    ).interactive()
+
+def create_yoy_chart(crime_rates, budget=None):
+    """Create an Altair bar chart of the year-over-year change in the overall crime rate."""
+    data = downsample(crime_rates, 'Year', 'PercentChange', budget=budget, method='minmax')
+    return alt.Chart(data).mark_bar().encode(
+        x=alt.X('Year:T', title='Year'),
+        y=alt.Y('PercentChange:Q', title='Percent Change'),
+        color=alt.condition(
+            alt.datum.PercentChange > 0,
+            alt.value("red"),  # The positive color
+            alt.value("green")  # The negative color
+        ),
+        tooltip=['Year:T', alt.Tooltip('PercentChange:Q', format='.2f')]
+    ).properties(
+        title='Year-over-Year Change in Overall Crime Rate'
+    ).interactive()
+
+def report(cube):
+    """
+    Build the page's charts and tables with the default widget states, without Streamlit.
+    :param cube: CrimeCube.
+    :return: List of (heading, chart, table or text) sections.
+    """
+    crime_rates = prepare_overall_trend(derived_metrics(cube))
+    trends = prepare_jurisdiction_trends(cube, cube.years.min(), cube.years.max())
+    return [
+        ("Overall Crime Rate Trend", create_overall_chart(crime_rates)),
+        ("Specific Crime Types", create_specific_chart(prepare_specific_trends(cube, DEFAULT_CRIMES))),
+        ("Year-over-Year Change in Overall Crime Rate", create_yoy_chart(crime_rates)),
+        ("Where Is Crime Rising Fastest?", trends[trends['Trend'] == 'Rising'].head(25)),
+        ("Where Is Crime Falling Fastest?", trends[trends['Trend'] == 'Falling'].iloc[::-1].head(25)),
+    ]
+
+@st.fragment
+def show_specific_trends(cube, version):
+    """
+    Chart of the selected crime rates. Changing the selection reruns only this section.
+    :param cube: CrimeCube.
+    :param version: Dataset version the figures are cached under.
+    """
+    selected_crimes = st.multiselect("Select crime types to analyze:", CRIME_TYPES, default=DEFAULT_CRIMES)
 
-    # Calculate percent change
-    crime_rates['PercentChange'] = crime_rates['OverallCrimeRatePer100k'].pct_change() * 100
+    if selected_crimes:
+        with profiling.stage('charts'):
+            chart = cached_figure(('trend_analysis', 'specific', version, tuple(selected_crimes)),
+                                  lambda: create_specific_chart(prepare_specific_trends(cube, selected_crimes)))
+            st.altair_chart(chart, use_container_width=True)
+
+@st.fragment
+def show_jurisdiction_trends(cube, version):
+    """
+    Trend table of every jurisdiction and crime rate over the selected years. The year range and
+    significance filter rerun only this section.
+    :param cube: CrimeCube.
+    :param version: Dataset version the results are cached under.
+    """
+    first_year, last_year = int(cube.years.min()), int(cube.years.max())
+    start_year, end_year = st.slider("Years to analyze:", first_year, last_year, (first_year, last_year))
+    significant_only = st.checkbox("Only show significant trends (p < 0.05)")
+    with profiling.stage('aggregate'):
+        trends = cached_result(('trend_analysis', 'jurisdiction_trends', version, start_year, end_year),
+                               lambda: prepare_jurisdiction_trends(cube, start_year, end_year))
+        if significant_only:
+            trends = trends[trends['Trend'] != 'No Significant Trend']
+    # Column formats instead of a Styler, which would render every cell on the server
+    st.dataframe(trends, use_container_width=True, hide_index=True, column_config={
+        'OLSSlope': st.column_config.NumberColumn(format='%.3f'),
+        'OLSPValue': st.column_config.NumberColumn(format='%.4f'),
+        'MKTau': st.column_config.NumberColumn(format='%.3f'),
+        'MKZ': st.column_config.NumberColumn(format='%.2f'),
+        'MKPValue': st.column_config.NumberColumn(format='%.4f'),
+        'SenSlope': st.column_config.NumberColumn(format='%.3f'),
+        'SenSlopePct': st.column_config.NumberColumn(format='%+.2f%%'),
+        'ChangePointYear': st.column_config.NumberColumn(format='%d'),
+        'ChangePointPValue': st.column_config.NumberColumn(format='%.4f'),
+    })
+
+def show():
+    st.header("Crime Rate Trend Analysis in Maryland (1975-2020)")
+    st.write("Explore how overall and specific crime rates have changed over the years in Maryland.")
+
+    # Load data
+    with profiling.stage('load'):
+        cube = get_cube()
+        derived = get_derived()
+        version = dataset_version()
+    with profiling.stage('aggregate'):
+        crime_rates = prepare_overall_trend(derived)
+
+    # Create overall trend chart
+    with profiling.stage('charts'):
+        chart = cached_figure(('trend_analysis', 'overall', version), lambda: create_overall_chart(crime_rates))
+        st.altair_chart(chart, use_container_width=True)
 
     # Display key statistics
     st.subheader("Key Statistics")
@@ -39,43 +161,21 @@ def show():
 
     # Specific crime types analysis
     st.subheader("Specific Crime Types Analysis")
-    crime_types = ['MurderPer100k', 'RapePer100k', 'RobberyPer100k', 'AggAssaultPer100k',
-                   'BreakAndEnterPer100k', 'LarcenyTheftPer100k', 'MotorVehicleTheftPer100k']
-
-    selected_crimes = st.multiselect("Select crime types to analyze:", crime_types, default=['MurderPer100k', 'RobberyPer100k'])
-
-    if selected_crimes:
-        specific_crime_rates = df.groupby('Year')[selected_crimes].mean().reset_index()
-        specific_crime_rates = pd.melt(specific_crime_rates, id_vars=['Year'], value_vars=selected_crimes,
-                                       var_name='Crime Type', value_name='Rate')
-
-        specific_chart = alt.Chart(specific_crime_rates).mark_line(point=True).encode(
-            x=alt.X('Year:T', title='Year'),
-            y=alt.Y('Rate:Q', title='Crime Rate (per 100k)'),
-            color='Crime Type:N',
-            tooltip=['Year:T', 'Crime Type:N', alt.Tooltip('Rate:Q', format='.2f')]
-        ).properties(
-            title='Specific Crime Rate Trends in Maryland (1975-2020)'
-        ).interactive()
-
-        st.altair_chart(specific_chart, use_container_width=True)
+    show_specific_trends(cube, version)
 
     # Year-over-year change
     st.subheader("Year-over-Year Change in Overall Crime Rate")
-    yoy_chart = alt.Chart(crime_rates).mark_bar().encode(
-        x=alt.X('Year:T', title='Year'),
-        y=alt.Y('PercentChange:Q', title='Percent Change'),
-        color=alt.condition(
-            alt.datum.PercentChange > 0,
-            alt.value("red"),  # The positive color
-            alt.value("green")  # The negative color
-        ),
-        tooltip=['Year:T', alt.Tooltip('PercentChange:Q', format='.2f')]
-    ).properties(
-        title='Year-over-Year Change in Overall Crime Rate'
-    ).interactive()
-
-    st.altair_chart(yoy_chart, use_container_width=True)
+    with profiling.stage('charts'):
+        chart = cached_figure(('trend_analysis', 'yoy', version), lambda: create_yoy_chart(crime_rates))
+        st.altair_chart(chart, use_container_width=True)
+
+    # Trends of every jurisdiction and crime type
+    st.subheader("Where Is Crime Rising Fastest?")
+    st.write("Trend of every jurisdiction and crime rate. Sen's slope is the median change per year, shown as a "
+             "percentage of the series mean so crime types can be compared. Mann-Kendall tests whether the trend is "
+             "significant, and the change point is the last year before the most likely shift in level (Pettitt). "
+             "Click a column header to sort.")
+    show_jurisdiction_trends(cube, version)
 
     # Additional insights
     st.subheader("Key Insights")
@@ -86,10 +186,5 @@ def show():
     st.write("5. Factors such as economic conditions, law enforcement strategies, and social changes may contribute to these trends.")
 
     # Allow users to download the data
-    csv = crime_rates.to_csv(index=False)
-    st.download_button(
-        label="Download trend data as CSV",
-        data=csv,
-        file_name="maryland_crime_rate_trend.csv",
-        mime="text/csv",
-    )
+    with profiling.stage('export'):
+        download_buttons("trend data", "maryland_crime_rate_trend", ('trend_analysis',), lambda: crime_rates)
@@ -1,3 +1,29 @@
 APP_TITLE = "Maryland Crime Data Analysis"
 SIDEBAR_TITLE = "Navigation"
 DATA_FILE_PATH = "data/cleaned_MD_Crime_Data.csv"
+
+# Maximum number of points a single chart sends to the browser
+CHART_POINT_BUDGET = 2000
+
+# Bounds of the shared cache of built chart figures
+FIGURE_CACHE_MAX_ENTRIES = 256
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Bound of the shared cache of analysis results
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Bound of the shared cache of serialized page exports
+EXPORT_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# Year-over-year changes beyond +/- this fraction (1000%) are shown as capped
+PCT_CHANGE_CAP = 10
+
+# Resamples behind the bootstrap intervals and permutation p-values
+BOOTSTRAP_RESAMPLES = 10000
+
+# Reduction goal of the strategic plan: 10% lower crime rates within five years
+REDUCTION_TARGET = 0.10
+FORECAST_HORIZON = 5
+
+# Worker processes for model fitting, None for one per CPU
+FORECAST_WORKERS = None
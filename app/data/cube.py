@@ -0,0 +1,170 @@
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+@dataclass(frozen=True)
+class CrimeCube:
+    """
+    Jurisdiction x Year x metric totals with the rollups the pages read.
+    Everything in a cube is shared between sessions and must be treated as read-only.
+    """
+    jurisdictions: pd.Index
+    years: pd.Index
+    metrics: list
+    sums: np.ndarray  # (jurisdiction, year, metric) totals, 0 where there are no rows
+    counts: np.ndarray  # (jurisdiction, year) number of source rows
+    year_sum: pd.DataFrame
+    year_mean: pd.DataFrame
+    jurisdiction_sum: pd.DataFrame
+    jurisdiction_mean: pd.DataFrame
+    total_sum: pd.Series
+    total_mean: pd.Series
+
+    def panel(self, metric, how='mean'):
+        """
+        Dense Jurisdiction x Year view of one metric.
+        :param metric: Metric column name.
+        :param how: 'sum' or 'mean' over the source rows of each cell.
+        :return: DataFrame indexed by Jurisdiction with one column per Year, NaN where there is no data.
+        """
+        values = self.sums[:, :, self.metrics.index(metric)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = values / self.counts if how == 'mean' else np.where(self.counts > 0, values, np.nan)
+        return pd.DataFrame(values, index=self.jurisdictions, columns=self.years)
+
+    def jurisdiction_year(self, metrics, how='sum', jurisdictions=None):
+        """
+        Long-format Jurisdiction/Year rows for the cells that have data.
+        :param metrics: Metric column names to include.
+        :param how: 'sum' or 'mean' over the source rows of each cell.
+        :param jurisdictions: Optional list of jurisdictions to keep, in the order given.
+        :return: DataFrame with Jurisdiction, Year and one column per metric.
+        """
+        rows = np.arange(len(self.jurisdictions)) if jurisdictions is None else self.jurisdictions.get_indexer(jurisdictions)
+        rows = rows[rows >= 0]
+        columns = [self.metrics.index(metric) for metric in metrics]
+        counts = self.counts[rows]
+        j_idx, y_idx = np.nonzero(counts)
+        values = self.sums[rows][j_idx, y_idx][:, columns]
+        if how == 'mean':
+            values = values / counts[j_idx, y_idx][:, None]
+        result = pd.DataFrame(values, columns=metrics)
+        result.insert(0, 'Year', self.years[y_idx])
+        result.insert(0, 'Jurisdiction', self.jurisdictions[rows][j_idx])
+        return result
+
+class CubeAccumulator:
+    """
+    Fold crime frames into per-(Jurisdiction, Year) totals.
+    Memory is bounded by the number of Jurisdiction x Year cells, not by the number of rows added.
+    """
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self.integer_metrics = None
+        self.rows = 0
+        self._sums = None
+        self._counts = None
+
+    @classmethod
+    def from_cube(cls, cube):
+        """
+        Resume accumulating from an existing cube.
+        :param cube: CrimeCube to start from.
+        :return: CubeAccumulator holding the cube's totals.
+        """
+        accumulator = cls(list(cube.metrics))
+        accumulator.integer_metrics = [metric for metric in cube.metrics
+                                       if pd.api.types.is_integer_dtype(cube.year_sum[metric])]
+        j_idx, y_idx = np.nonzero(cube.counts)
+        index = pd.MultiIndex.from_arrays([cube.jurisdictions[j_idx], cube.years[y_idx]],
+                                          names=['Jurisdiction', 'Year'])
+        accumulator._sums = pd.DataFrame(cube.sums[j_idx, y_idx], index=index, columns=accumulator.metrics)
+        accumulator._counts = pd.Series(cube.counts[j_idx, y_idx], index=index)
+        accumulator.rows = int(cube.counts.sum())
+        return accumulator
+
+    def add(self, df):
+        """
+        Fold one preprocessed frame into the running totals.
+        :param df: DataFrame with Jurisdiction and Year columns.
+        :return: The accumulator, for chaining.
+        """
+        if self.metrics is None:
+            self.metrics = [column for column in df.select_dtypes('number').columns if column != 'Year']
+        if self.integer_metrics is None:
+            self.integer_metrics = [metric for metric in self.metrics if pd.api.types.is_integer_dtype(df[metric])]
+        grouped = df.groupby(['Jurisdiction', 'Year'], observed=True)
+        sums = grouped[self.metrics].sum()
+        counts = grouped.size()
+        # Plain labels so chunks with different categories line up
+        index = pd.MultiIndex.from_arrays([sums.index.get_level_values(0).astype(str),
+                                           sums.index.get_level_values(1).astype(int)],
+                                          names=['Jurisdiction', 'Year'])
+        sums.index = index
+        counts.index = index
+        if self._sums is None:
+            self._sums, self._counts = sums, counts
+        else:
+            self._sums = self._sums.add(sums, fill_value=0)
+            self._counts = self._counts.add(counts, fill_value=0)
+        self.rows += len(df)
+        return self
+
+    def finish(self):
+        """
+        Build the cube from everything added so far.
+        :return: CrimeCube.
+        """
+        return cube_from_totals(self._sums, self._counts, self.integer_metrics or ())
+
+def build_cube(df, metrics=None):
+    """
+    Aggregate a preprocessed crime frame into a CrimeCube.
+    :param df: DataFrame with Jurisdiction and Year columns.
+    :param metrics: Columns to aggregate. Defaults to every numeric column except Year.
+    :return: CrimeCube.
+    """
+    return CubeAccumulator(metrics).add(df).finish()
+
+def cube_from_totals(sums, counts, integer_metrics=()):
+    """
+    Build a CrimeCube from per-(Jurisdiction, Year) totals.
+    :param sums: DataFrame indexed by (Jurisdiction, Year) with one column per metric.
+    :param counts: Series with the number of source rows behind each (Jurisdiction, Year) total.
+    :param integer_metrics: Metrics whose sums are reported as integers.
+    :return: CrimeCube.
+    """
+    metrics = list(sums.columns)
+    counts = counts.reindex(sums.index)
+    jurisdiction_labels = sums.index.get_level_values(0).astype(str)
+    year_labels = sums.index.get_level_values(1).astype(int)
+    jurisdictions = pd.Index(np.unique(jurisdiction_labels), name='Jurisdiction')
+    years = pd.Index(np.unique(year_labels), name='Year')
+    j_idx = jurisdictions.get_indexer(jurisdiction_labels)
+    y_idx = years.get_indexer(year_labels)
+
+    dense_sums = np.zeros((len(jurisdictions), len(years), len(metrics)))
+    dense_counts = np.zeros((len(jurisdictions), len(years)), dtype=np.int64)
+    dense_sums[j_idx, y_idx] = sums.to_numpy(dtype=np.float64)
+    dense_counts[j_idx, y_idx] = counts.to_numpy(dtype=np.int64)
+    dense_sums.setflags(write=False)
+    dense_counts.setflags(write=False)
+
+    def rollup(values, row_counts, index):
+        total = pd.DataFrame(values, index=index, columns=metrics)
+        mean = total.div(row_counts, axis=0)
+        for metric in integer_metrics:
+            total[metric] = total[metric].round().astype(np.int64)
+        return total, mean
+
+    year_sum, year_mean = rollup(dense_sums.sum(axis=0), dense_counts.sum(axis=0), years)
+    jurisdiction_sum, jurisdiction_mean = rollup(dense_sums.sum(axis=1), dense_counts.sum(axis=1), jurisdictions)
+    total_sum = year_sum.sum()
+    total_mean = year_sum.sum().div(dense_counts.sum())
+
+    return CrimeCube(jurisdictions=jurisdictions, years=years, metrics=metrics,
+                     sums=dense_sums, counts=dense_counts,
+                     year_sum=year_sum, year_mean=year_mean,
+                     jurisdiction_sum=jurisdiction_sum, jurisdiction_mean=jurisdiction_mean,
+                     total_sum=total_sum, total_mean=total_mean)
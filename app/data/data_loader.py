@@ -1,14 +1,123 @@
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+import numpy as np
 import pandas as pd
+from app.data.cube import CubeAccumulator, build_cube, cube_from_totals
+from app.data.derived import build_derived
+from app.data.storage import SQLiteStorage
 
-def load_data(filepath='cleaned_MD_Crime_Data.csv'):
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # The Parquet sidecar is optional
+    pa = pq = None
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), 'cleaned_MD_Crime_Data.csv')
+
+# Environment variable that points the app at another extract
+DATA_PATH_ENV = 'MARYLAND_CRIME_DATA'
+
+# Bump when preprocess_data changes so existing sidecars are rebuilt
+SIDECAR_VERSION = 2
+SIDECAR_METADATA_KEY = b'maryland_crime_source'
+
+# Files at least this large are streamed into the cube instead of loaded whole
+STREAMING_THRESHOLD_BYTES = 512 * 1024 * 1024
+STREAMING_CHUNKSIZE = 200_000
+
+CRIME_TYPES = ['Murder', 'Rape', 'Robbery', 'AggAssault', 'BreakAndEnter', 'LarcenyTheft', 'MotorVehicleTheft']
+VIOLENT_CRIME_TYPES = ['Murder', 'Rape', 'Robbery', 'AggAssault']
+PROPERTY_CRIME_TYPES = ['BreakAndEnter', 'LarcenyTheft', 'MotorVehicleTheft']
+
+COUNT_COLUMNS = ['Population'] + CRIME_TYPES + ['GrandTotal', 'ViolentCrimeTotal', 'PropertyCrimeTotal']
+
+RATE_COLUMNS = [
+    'PercentChange', 'ViolentCrimePercent', 'ViolentCrimePercentChange',
+    'PropertyCrimePercent', 'PropertyCrimePercentChange',
+    'OverallCrimeRatePer100k', 'OverallPercentChangePer100k',
+    'ViolentCrimeRatePer100k', 'ViolentCrimeRatePercentChangePer100k',
+    'PropertyCrimeRatePer100k', 'PropertyCrimeRatePercentChangePer100k',
+] + [f'{crime}Per100k' for crime in CRIME_TYPES] + [f'{crime}RatePercentChangePer100k' for crime in CRIME_TYPES]
+
+# Column families whose shares and year-over-year changes are precomputed
+METRIC_FAMILIES = {
+    'counts': CRIME_TYPES,
+    'rates': [f'{crime}Per100k' for crime in CRIME_TYPES],
+}
+
+# Declared column types of the cleaned dataset
+DATA_SCHEMA = {
+    'Jurisdiction': 'category',
+    'Year': 'int16',
+    **{column: 'int32' for column in COUNT_COLUMNS},
+    **{column: 'float32' for column in RATE_COLUMNS},
+}
+
+# Derived rate columns and the count each one is computed from
+RATE_SOURCES = {
+    'OverallCrimeRatePer100k': 'GrandTotal',
+    'ViolentCrimeRatePer100k': 'ViolentCrimeTotal',
+    'PropertyCrimeRatePer100k': 'PropertyCrimeTotal',
+    **{f'{crime}Per100k': crime for crime in CRIME_TYPES},
+}
+
+# Year-over-year percent change columns and the column each one tracks
+CHANGE_SOURCES = {
+    'PercentChange': 'GrandTotal',
+    'ViolentCrimePercentChange': 'ViolentCrimeTotal',
+    'PropertyCrimePercentChange': 'PropertyCrimeTotal',
+    'OverallPercentChangePer100k': 'OverallCrimeRatePer100k',
+    'ViolentCrimeRatePercentChangePer100k': 'ViolentCrimeRatePer100k',
+    'PropertyCrimeRatePercentChangePer100k': 'PropertyCrimeRatePer100k',
+    **{f'{crime}RatePercentChangePer100k': f'{crime}Per100k' for crime in CRIME_TYPES},
+}
+
+# Dataset file extensions read through a storage backend instead of as CSV
+STORAGE_BACKENDS = {
+    '.sqlite': SQLiteStorage,
+    '.sqlite3': SQLiteStorage,
+    '.db': SQLiteStorage,
+}
+
+logger = logging.getLogger(__name__)
+
+# Process-wide dataset store shared by every Streamlit session
+_store = {}
+_store_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+def load_data(filepath='cleaned_MD_Crime_Data.csv', use_sidecar=True):
     """
-    Load data from a CSV file.
-    :param filepath: Path to the CSV file.
+    Load data from a CSV file or a storage backend such as a SQLite store.
+    When pyarrow is available the preprocessed frame is also written to a Parquet
+    sidecar next to the CSV and read back on later loads, as long as the CSV has
+    not changed since the sidecar was written.
+    :param filepath: Path to the CSV file or store.
+    :param use_sidecar: Whether to read and write the Parquet sidecar.
     :return: DataFrame with the loaded data.
     """
     try:
+        storage = open_storage(filepath)
+        if storage is not None:
+            return storage.read_frame()
+        source = _sidecar_source(filepath) if use_sidecar and pq is not None else None
+        if source is not None:
+            df = _read_sidecar(filepath, source)
+            if df is not None:
+                return df
         df = pd.read_csv(filepath)
         df = preprocess_data(df)
+        if source is not None:
+            _write_sidecar(filepath, source, df)
         return df
     except FileNotFoundError:
         print(f"File not found: {filepath}")
@@ -16,12 +125,397 @@ def load_data(filepath='cleaned_MD_Crime_Data.csv'):
 
 def preprocess_data(df):
     """
-    Preprocess the data by handling missing values, and converting data types if necessary.
+    Preprocess the data by handling missing values and applying DATA_SCHEMA.
+    Columns that are not part of the schema keep the types inferred by the reader.
     :param df: DataFrame to preprocess.
     :return: Preprocessed DataFrame.
     """
-    # Example preprocessing steps
     df = df.dropna()  # Drop rows with missing values
-    df['Year'] = df['Year'].astype(int)  # Ensure 'Year' column is of integer type
-    df = df.apply(pd.to_numeric, errors='ignore')  # Convert numeric columns to appropriate data types
+    before = df.memory_usage(deep=True).sum()
+    df = df.astype({column: dtype for column, dtype in DATA_SCHEMA.items() if column in df.columns})
+    after = df.memory_usage(deep=True).sum()
+    logger.info("Applied dataset schema: %.2f MB -> %.2f MB (%.1f%% smaller)",
+                before / 1e6, after / 1e6, (1 - after / before) * 100 if before else 0.0)
     return df
+
+def file_signature(filepath):
+    """
+    Identify the current version of a data file.
+    :param filepath: Path to the data file.
+    :return: Tuple of (modification time in ns, size in bytes), or None if the file is missing.
+    """
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def open_storage(filepath):
+    """
+    Storage backend for a dataset path, chosen by its extension from STORAGE_BACKENDS.
+    :param filepath: Path to the dataset.
+    :return: Backend instance, or None for a CSV file.
+    """
+    backend = STORAGE_BACKENDS.get(os.path.splitext(filepath)[1].lower())
+    return None if backend is None else backend(filepath, schema=DATA_SCHEMA)
+
+def storage_cube(storage):
+    """
+    Build the aggregate cube from per-(Jurisdiction, Year) totals summed inside a storage backend.
+    Only one row per jurisdiction-year leaves the store.
+    :param storage: Storage backend, see open_storage.
+    :return: CrimeCube.
+    """
+    columns = storage.columns()
+    metrics = [column for column, declared in columns.items()
+               if column not in storage.keys and declared in ('INTEGER', 'REAL')]
+    sums, counts = storage.totals(metrics)
+    return cube_from_totals(sums, counts, [metric for metric in metrics if columns[metric] == 'INTEGER'])
+
+def build_store(csv_path, store_path, chunksize=STREAMING_CHUNKSIZE):
+    """
+    Bulk-load a CSV into a storage backend, e.g. a SQLite file, replacing its contents.
+    The CSV is read and preprocessed in chunks, so memory stays bounded by the chunk size.
+    :param csv_path: Path to the CSV file.
+    :param store_path: Path of the store. Its extension must be one of STORAGE_BACKENDS.
+    :param chunksize: Number of rows read per chunk.
+    :return: Number of rows written.
+    """
+    storage = open_storage(store_path)
+    if storage is None:
+        raise ValueError(f"No storage backend for {store_path}; use one of {', '.join(STORAGE_BACKENDS)}")
+    start = time.perf_counter()
+    rows = storage.write(preprocess_data(chunk) for chunk in pd.read_csv(csv_path, chunksize=chunksize))
+    logger.info("Loaded %s rows from %s into %s in %.2fs", rows, csv_path, store_path, time.perf_counter() - start)
+    return rows
+
+def sidecar_path(filepath):
+    """
+    Locate the Parquet sidecar for a CSV file.
+    :param filepath: Path to the CSV file.
+    :return: Path of the sidecar file.
+    """
+    return os.path.splitext(filepath)[0] + '.parquet'
+
+def _sidecar_source(filepath):
+    """Describe the CSV version a sidecar must have been built from."""
+    signature = file_signature(filepath)
+    if signature is None:
+        raise FileNotFoundError(filepath)
+    mtime_ns, size = signature
+    return f'{SIDECAR_VERSION}:{mtime_ns}:{size}'.encode()
+
+def _read_sidecar(filepath, source):
+    """Read the sidecar if it was built from the current CSV, otherwise return None."""
+    path = sidecar_path(filepath)
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+        if metadata.get(SIDECAR_METADATA_KEY) != source:
+            return None
+        return pq.read_table(path).to_pandas()
+    except (OSError, pa.ArrowException):
+        return None
+
+def _write_sidecar(filepath, source, df):
+    """Write the sidecar atomically so concurrent workers never read a partial file."""
+    path = sidecar_path(filepath)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = {**(table.schema.metadata or {}), SIDECAR_METADATA_KEY: source}
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+        os.replace(tmp_path, path)
+    except (OSError, pa.ArrowException) as e:
+        # A read-only data directory only costs us the faster cold start
+        print(f"Could not write data sidecar {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def stream_cube(filepath=None, chunksize=STREAMING_CHUNKSIZE):
+    """
+    Aggregate a CSV file into a cube without holding the whole dataset in memory.
+    Each chunk is preprocessed and folded into per-(Jurisdiction, Year) totals, so
+    memory stays bounded by the chunk size and the number of cells.
+    :param filepath: Path to the CSV file. Defaults to data_path().
+    :param chunksize: Number of rows read per chunk.
+    :return: Tuple of (CrimeCube, dictionary with rows, chunks, seconds and peak_rss_mb).
+    """
+    filepath = filepath or data_path()
+    start = time.perf_counter()
+    accumulator = CubeAccumulator()
+    chunks = 0
+    for chunk in pd.read_csv(filepath, chunksize=chunksize):
+        accumulator.add(preprocess_data(chunk))
+        chunks += 1
+    cube = accumulator.finish()
+    stats = {
+        'rows': accumulator.rows,
+        'chunks': chunks,
+        'seconds': time.perf_counter() - start,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    logger.info("Streamed %s rows in %s chunks from %s in %.2fs (peak RSS %s MB)",
+                stats['rows'], chunks, filepath, stats['seconds'], stats['peak_rss_mb'])
+    return cube, stats
+
+def data_path():
+    """
+    Path of the dataset the app reads.
+    :return: The MARYLAND_CRIME_DATA environment variable if set, otherwise the bundled CSV.
+    """
+    return os.environ.get(DATA_PATH_ENV, DEFAULT_DATA_PATH)
+
+def peak_rss_mb():
+    """
+    Report the peak resident set size of this process.
+    :return: Peak RSS in megabytes, or None where the platform does not report it.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def _load_entry(filepath, need_frame=True):
+    """
+    Return the store entry for a file, loading it and building its cube on a miss.
+    When only the cube is needed, CSV files of at least STREAMING_THRESHOLD_BYTES are streamed.
+    Storage backends always aggregate in the store and their entries never hold the frame.
+    """
+    key = os.path.abspath(filepath or data_path())
+    signature = file_signature(key)
+    storage = open_storage(key)
+    need_frame = need_frame and storage is None
+    with _store_lock:
+        entry = _store.get(key)
+        if entry is not None and entry['signature'] == signature and (entry['df'] is not None or not need_frame):
+            _stats['hits'] += 1
+            return entry
+        _stats['misses'] += 1
+        if entry is not None and entry['signature'] == signature:
+            entry['df'] = load_data(key)
+        elif not need_frame and signature is not None and storage is not None:
+            entry = {'signature': signature, 'df': None, 'cube': storage_cube(storage)}
+        elif not need_frame and signature is not None and signature[1] >= STREAMING_THRESHOLD_BYTES:
+            entry = {'signature': signature, 'df': None, 'cube': stream_cube(key)[0]}
+        else:
+            df = load_data(key)
+            entry = {'signature': signature, 'df': df, 'cube': None if df.empty else build_cube(df)}
+        if signature is not None:
+            _store[key] = entry
+        return entry
+
+def get_data(filepath=None):
+    """
+    Return the preprocessed dataset from the process-wide store.
+    The file is loaded and preprocessed once and reused by all sessions until
+    its modification time or size changes.
+    A storage backend's table is not kept in memory; it is read for each call instead, so
+    prefer get_cube or filtered reads through open_storage for stores.
+    :param filepath: Path to the CSV file or store. Defaults to data_path().
+    :return: DataFrame with the loaded data. Callers receive their own copy; with pandas
+        copy-on-write enabled it shares the store's memory until the caller writes to it.
+    """
+    entry = _load_entry(filepath)
+    if entry['df'] is None:
+        return load_data(os.path.abspath(filepath or data_path()))
+    return entry['df'].copy(deep=not pd.get_option('mode.copy_on_write'))
+
+def get_cube(filepath=None):
+    """
+    Return the aggregate cube of the dataset from the process-wide store.
+    The cube is built together with the dataset and shared by all sessions.
+    Large CSV files are streamed and storage backends such as SQLite sum per
+    jurisdiction-year in the store, so the full frame is never held in memory.
+    :param filepath: Path to the CSV file. Defaults to data_path().
+    :return: CrimeCube, or None if the file could not be loaded.
+    """
+    return _load_entry(filepath, need_frame=False)['cube']
+
+def derived_metrics(cube):
+    """
+    Compute the derived series of METRIC_FAMILIES for a cube.
+    :param cube: CrimeCube.
+    :return: DerivedMetrics.
+    """
+    return build_derived(cube, METRIC_FAMILIES)
+
+def get_derived(filepath=None):
+    """
+    Return the derived series of the dataset from the process-wide store.
+    Capped year-over-year changes, shares of total and mean rate changes are computed
+    once per dataset version, statewide and per jurisdiction, and shared by all sessions.
+    :param filepath: Path to the CSV file or store. Defaults to data_path().
+    :return: DerivedMetrics, or None if the file could not be loaded.
+    """
+    entry = _load_entry(filepath, need_frame=False)
+    with _store_lock:
+        if entry.get('derived') is None and entry['cube'] is not None:
+            entry['derived'] = derived_metrics(entry['cube'])
+        return entry.get('derived')
+
+def dataset_version(filepath=None):
+    """
+    Identify the version of the dataset currently in the store.
+    Changes whenever the file is replaced or a year is appended, so it can key derived caches.
+    Two files never share a version, even with the same modification time and size.
+    :param filepath: Path to the CSV file or store. Defaults to data_path().
+    :return: String built from a hash of the file's path, its modification time and its size.
+    """
+    key = os.path.abspath(filepath or data_path())
+    mtime_ns, size = _load_entry(key, need_frame=False)['signature'] or (0, 0)
+    # A hash rather than the path itself, since the version is published by the API
+    path_hash = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+    return f"{path_hash}-{mtime_ns}-{size}"
+
+def derive_columns(rows, previous, fill_values=None):
+    """
+    Compute the totals, shares, rates and percent changes of new raw rows.
+    Changes from a zero value, and changes for jurisdictions without an earlier
+    row, are filled from fill_values the same way the cleaned dataset was.
+    :param rows: DataFrame with Jurisdiction, Year, Population and the raw crime counts.
+    :param previous: DataFrame with the latest earlier row of each jurisdiction, indexed by Jurisdiction.
+    :param fill_values: Optional mapping of change column to fill value, e.g. the column medians.
+    :return: DataFrame with every column of the cleaned dataset.
+    """
+    def with_rates(frame):
+        counts = frame[['Population'] + CRIME_TYPES].astype(float)
+        counts['GrandTotal'] = counts[CRIME_TYPES].sum(axis=1)
+        counts['ViolentCrimeTotal'] = counts[VIOLENT_CRIME_TYPES].sum(axis=1)
+        counts['PropertyCrimeTotal'] = counts[PROPERTY_CRIME_TYPES].sum(axis=1)
+        for rate, source in RATE_SOURCES.items():
+            counts[rate] = counts[source] / counts['Population'] * 100000
+        return counts
+
+    rows = rows.reset_index(drop=True)
+    current = with_rates(rows)
+    prior = with_rates(previous.reindex(rows['Jurisdiction']).reset_index(drop=True))
+
+    result = rows[['Jurisdiction', 'Year']].copy()
+    for column in COUNT_COLUMNS:
+        result[column] = current[column].round().astype('int64')
+    result['ViolentCrimePercent'] = (current['ViolentCrimeTotal'] / current['GrandTotal'] * 100).round(1)
+    result['PropertyCrimePercent'] = (current['PropertyCrimeTotal'] / current['GrandTotal'] * 100).round(1)
+    for rate in RATE_SOURCES:
+        result[rate] = current[rate].round(1)
+    for change, source in CHANGE_SOURCES.items():
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = (current[source] - prior[source]) / prior[source] * 100
+        values = values.mask((current[source] == 0) & (prior[source] == 0), 0.0)
+        values = values.replace([np.inf, -np.inf], np.nan)
+        if fill_values is not None and change in fill_values:
+            values = values.fillna(fill_values[change])
+        result[change] = values.round(1)
+    return result[list(DATA_SCHEMA)]
+
+def _latest_rows(storage, cube, before_year):
+    """
+    Rows of each jurisdiction's latest reported year before before_year, read from a storage backend.
+    The cube tells which year that is, so only those jurisdiction-years are read.
+    """
+    earlier = cube.years < before_year
+    reported = cube.counts[:, earlier] > 0
+    if not reported.any():
+        return storage.read_frame(jurisdictions=[])
+    years = cube.years[earlier].to_numpy()
+    latest = years[reported.shape[1] - 1 - reported[:, ::-1].argmax(axis=1)]
+    has_history = reported.any(axis=1)
+    frames = [storage.read_frame(jurisdictions=cube.jurisdictions[has_history & (latest == year)], years=(year, year))
+              for year in np.unique(latest[has_history])]
+    return pd.concat(frames, ignore_index=True)
+
+def append_year(rows, filepath=None):
+    """
+    Append a new reporting year without rebuilding the dataset.
+    Only the new rows' derived columns are computed. The rows are appended to the CSV,
+    folded into the cached cube and written to the Parquet sidecar, so a restart reads
+    the updated data without parsing the CSV again. For a storage backend the rows are
+    inserted into the store instead, and only the rows and statistics the new rows'
+    changes are computed from are read out of it.
+    :param rows: DataFrame with Jurisdiction, Year, Population and the raw crime counts, one row per
+        jurisdiction, all for the same year.
+    :param filepath: Path to the CSV file or store. Defaults to data_path().
+    :return: The appended rows with all derived columns.
+    :raises ValueError: If rows span several years, repeat a jurisdiction, already exist or are not later
+        than a jurisdiction's latest reported year.
+    """
+    # Changes are computed against the years before the batch, so a batch must be a single year
+    if rows['Year'].nunique() != 1:
+        raise ValueError(f"Rows must be for a single year, got {sorted(int(year) for year in rows['Year'].unique())}")
+    repeated = rows.loc[rows['Jurisdiction'].duplicated(), 'Jurisdiction']
+    if not repeated.empty:
+        raise ValueError(f"Rows repeat {repeated.nunique()} jurisdictions, e.g. {repeated.iloc[0]}")
+    key = os.path.abspath(filepath or data_path())
+    storage = open_storage(key)
+    entry = _load_entry(key)
+    first_year = rows['Year'].min()
+    with _store_lock:
+        df = entry['df']
+        if storage is None:
+            existing = df[['Jurisdiction', 'Year']]
+            history = df[df['Year'] < first_year]
+            fill_values = df[list(CHANGE_SOURCES)].median()
+        else:
+            existing = storage.read_frame(['Year'], jurisdictions=rows['Jurisdiction'].unique(),
+                                          years=(first_year, rows['Year'].max()))
+            history = _latest_rows(storage, entry['cube'], first_year)
+            fill_values = storage.medians(list(CHANGE_SOURCES))
+        duplicates = rows.merge(existing.astype({'Jurisdiction': str}), on=['Jurisdiction', 'Year'])
+        if not duplicates.empty:
+            raise ValueError(f"Rows already exist for {len(duplicates)} jurisdiction-years, "
+                             f"e.g. {duplicates.iloc[0]['Jurisdiction']} {duplicates.iloc[0]['Year']}")
+        # Later years' changes were computed without the batch, so it must follow every reported year
+        if storage is None:
+            latest = df.groupby('Jurisdiction', observed=True)['Year'].max()
+        else:
+            cube = entry['cube']
+            reported = cube.counts > 0
+            latest = pd.Series(np.where(reported, cube.years.to_numpy(), -1).max(axis=1),
+                               index=cube.jurisdictions)[reported.any(axis=1)]
+        latest.index = latest.index.astype(str)
+        earlier = rows[rows['Year'].to_numpy() <= latest.reindex(rows['Jurisdiction']).fillna(-1).to_numpy()]
+        if not earlier.empty:
+            jurisdiction = earlier.iloc[0]['Jurisdiction']
+            raise ValueError(f"Rows must be later than each jurisdiction's latest year; {len(earlier)} are not, "
+                             f"e.g. {jurisdiction} {int(earlier.iloc[0]['Year'])} after {int(latest[jurisdiction])}")
+
+        history = history.astype({'Jurisdiction': str})
+        previous = history.sort_values('Year').groupby('Jurisdiction').tail(1).set_index('Jurisdiction')
+        new_rows = derive_columns(rows, previous, fill_values)
+
+        if storage is not None:
+            storage.append(new_rows)
+        else:
+            columns = pd.read_csv(key, nrows=0).columns
+            with open(key, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+            with open(key, 'a', newline='') as f:
+                if needs_newline:
+                    f.write('\n')
+                new_rows[columns].to_csv(f, header=False, index=False)
+
+        new_rows = preprocess_data(new_rows)
+        updated = None if storage is not None else preprocess_data(pd.concat([df, new_rows], ignore_index=True))
+        cube = CubeAccumulator.from_cube(entry['cube']).add(new_rows).finish()
+        signature = file_signature(key)
+        if storage is None and pq is not None:
+            _write_sidecar(key, _sidecar_source(key), updated)
+        _store[key] = {'signature': signature, 'df': updated, 'cube': cube}
+        logger.info("Appended %s rows for %s to %s", len(new_rows), sorted(new_rows['Year'].unique()), key)
+        return new_rows
+
+def cache_stats():
+    """
+    Report dataset store usage.
+    :return: Dictionary with hit and miss counters and the number of cached files.
+    """
+    with _store_lock:
+        return {**_stats, 'entries': len(_store)}
+
+def clear_cache():
+    """Drop every cached dataset and reset the counters."""
+    with _store_lock:
+        _store.clear()
+        _stats['hits'] = 0
+        _stats['misses'] = 0
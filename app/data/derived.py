@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from app.config import PCT_CHANGE_CAP
+
+@dataclass(frozen=True)
+class DerivedMetrics:
+    """
+    Year-over-year changes and shares of the crime count and rate columns, statewide and per jurisdiction.
+    Statewide values are the per-year totals the pages chart, jurisdiction values are indexed by
+    (Jurisdiction, Year). Changes are fractions capped at +/- cap, shares are fractions of the
+    total of the column's family. Everything is shared between sessions and must be treated as read-only.
+    """
+    cap: float
+    families: dict  # Family name -> columns whose shares add up to one
+    statewide: pd.DataFrame
+    statewide_change: pd.DataFrame
+    statewide_share: pd.DataFrame
+    jurisdiction: pd.DataFrame
+    jurisdiction_change: pd.DataFrame
+    jurisdiction_share: pd.DataFrame
+    mean_rates: pd.DataFrame  # Statewide mean of every per-100k rate per year
+    mean_rate_change: pd.DataFrame  # Uncapped year-over-year change of mean_rates
+
+    def changes(self, columns, jurisdiction=None):
+        """
+        Capped year-over-year changes in long format.
+        :param columns: Columns to include.
+        :param jurisdiction: Optional jurisdiction. Defaults to the statewide totals.
+        :return: DataFrame with Year, Crime Type and Pct Change, without years that have no change.
+        """
+        change = self.statewide_change if jurisdiction is None else self.jurisdiction_change.loc[jurisdiction]
+        melted = change[columns].reset_index().melt('Year', var_name='Crime Type', value_name='Pct Change')
+        return melted.dropna()
+
+    def summary(self, columns):
+        """
+        Total of each column over the whole period and its share of the columns' combined total.
+        :param columns: Columns to compare.
+        :return: DataFrame with Crime Type, Total Count and Percentage, largest first.
+        """
+        totals = self.statewide[columns].sum().sort_values(ascending=False)
+        return pd.DataFrame({
+            'Crime Type': totals.index,
+            'Total Count': totals.values,
+            'Percentage': (totals.values / totals.sum()) * 100
+        })
+
+    def distribution_change(self, columns):
+        """
+        Share of each column among the columns in the first and last year.
+        :param columns: Columns to compare. Their family shares are renormalized to the selection.
+        :return: Tuple of (DataFrame with Crime Type, Start Percentage, End Percentage and Change, start year, end year).
+        """
+        shares = self.statewide_share[columns].iloc[[0, -1]]
+        shares = shares.div(shares.sum(axis=1), axis=0) * 100
+        start, end = shares.iloc[0], shares.iloc[1]
+        table = pd.DataFrame({
+            'Crime Type': columns,
+            'Start Percentage': start,
+            'End Percentage': end,
+            'Change': end - start
+        })
+        return table, shares.index[0], shares.index[1]
+
+def capped_change(values, first, cap=None):
+    """
+    Vectorized year-over-year change of stacked series, like Series.pct_change.
+    :param values: 2-D array of rows in series and year order, one column per metric.
+    :param first: Boolean array marking the first row of each series.
+    :param cap: Optional bound; changes are clipped to [-cap, cap], which also catches changes from zero.
+    :return: 2-D array of changes as fractions, NaN on the first row of each series.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    previous = np.empty_like(values)
+    previous[1:] = values[:-1]
+    previous[first] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = values / previous - 1
+    return change if cap is None else np.clip(change, -cap, cap)
+
+def _shares(frame, families):
+    shares = pd.DataFrame(index=frame.index)
+    for columns in families.values():
+        total = frame[columns].sum(axis=1).replace(0, np.nan)
+        for column in columns:
+            shares[column] = frame[column] / total
+    return shares
+
+def build_derived(cube, families, cap=PCT_CHANGE_CAP):
+    """
+    Compute the derived series of a cube once, for every page to select from.
+    :param cube: CrimeCube.
+    :param families: Mapping of family name to columns, e.g. the crime counts and their per-100k rates.
+    :param cap: Bound of the capped year-over-year changes.
+    :return: DerivedMetrics.
+    """
+    columns = [column for family in families.values() for column in family]
+
+    statewide = cube.year_sum[columns]
+    first = np.zeros(len(statewide), dtype=bool)
+    first[:1] = True
+    statewide_change = pd.DataFrame(capped_change(statewide, first, cap), index=statewide.index, columns=columns)
+
+    # Cells with data only, so a change is taken from each jurisdiction's previous reported year
+    jurisdiction = cube.jurisdiction_year(columns, how='sum').set_index(['Jurisdiction', 'Year'])
+    labels = jurisdiction.index.get_level_values('Jurisdiction')
+    first = np.ones(len(jurisdiction), dtype=bool)
+    first[1:] = labels[1:] != labels[:-1]
+    jurisdiction_change = pd.DataFrame(capped_change(jurisdiction, first, cap), index=jurisdiction.index, columns=columns)
+
+    rates = [metric for metric in cube.metrics if metric.endswith('Per100k')]
+    mean_rates = cube.year_mean[rates]
+    first = np.zeros(len(mean_rates), dtype=bool)
+    first[:1] = True
+    mean_rate_change = pd.DataFrame(capped_change(mean_rates, first), index=mean_rates.index, columns=rates)
+
+    return DerivedMetrics(cap=cap, families=dict(families),
+                          statewide=statewide, statewide_change=statewide_change,
+                          statewide_share=_shares(statewide, families),
+                          jurisdiction=jurisdiction, jurisdiction_change=jurisdiction_change,
+                          jurisdiction_share=_shares(jurisdiction, families),
+                          mean_rates=mean_rates, mean_rate_change=mean_rate_change)
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from app.config import CHART_POINT_BUDGET
+
+def lttb_indices(x, y, n_out):
+    """
+    Pick points with Largest-Triangle-Three-Buckets, which keeps the visual shape of a line.
+    :param x: Sorted x values as floats.
+    :param y: y values as floats.
+    :param n_out: Number of points to keep.
+    :return: Sorted array of indices into x and y.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    every = (n - 2) / (n_out - 2)
+    edges = np.append(np.floor(np.arange(n_out - 1) * every).astype(int) + 1, n)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_x = x[edges[i + 1]:edges[i + 2]].mean()
+        next_y = y[edges[i + 1]:edges[i + 2]].mean()
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def minmax_indices(y, n_out):
+    """
+    Keep the minimum and maximum of each bucket, which preserves every spike.
+    :param y: y values as floats.
+    :param n_out: Approximate number of points to keep.
+    :return: Sorted array of indices into y.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, max(n_out // 2, 1) + 1).astype(int)
+    keep = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            bucket = y[start:end]
+            keep += [start + int(np.argmin(bucket)), start + int(np.argmax(bucket))]
+    return np.unique(keep)
+
+def _as_float(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype('int64').to_numpy(dtype=float)
+    return values.to_numpy(dtype=float)
+
+def downsample(df, x, y, series=None, budget=None, method='lttb'):
+    """
+    Reduce a chart's data to a point budget before it is sent to the browser.
+    The budget is shared between the series. Each series keeps its first, last,
+    minimum and maximum points, so shape and extremes survive.
+    :param df: Long-format chart data.
+    :param x: x column, numeric or datetime.
+    :param y: y column.
+    :param series: Optional column identifying the series, e.g. the colour encoding.
+    :param budget: Maximum number of points for the whole chart. Defaults to CHART_POINT_BUDGET.
+    :param method: 'lttb' for lines or 'minmax' for bars and spiky data.
+    :return: DataFrame with at most about budget rows, unchanged if already within it.
+    """
+    budget = budget or CHART_POINT_BUDGET
+    if len(df) <= budget:
+        return df
+    groups = [df] if series is None else [group for _, group in df.groupby(series, sort=False, observed=True)]
+    per_series = max(budget // len(groups), 5)
+    parts = []
+    for group in groups:
+        group = group.dropna(subset=[y]).sort_values(x)
+        ys = group[y].to_numpy(dtype=float)
+        if method == 'minmax':
+            indices = minmax_indices(ys, per_series)
+        else:
+            indices = lttb_indices(_as_float(group[x]), ys, per_series - 2)
+            indices = np.union1d(indices, [np.argmin(ys), np.argmax(ys)]) if len(ys) else indices
+        parts.append(group.iloc[indices])
+    return pd.concat(parts)
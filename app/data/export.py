@@ -0,0 +1,140 @@
+import glob
+import gzip
+import io
+import logging
+import os
+import shutil
+import tempfile
+from app.cache import LRUCache
+from app.config import EXPORT_CACHE_MAX_BYTES
+from app.data.data_loader import data_path, dataset_version, open_storage
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet exports are optional
+    pa = pa_csv = pq = None
+
+# Format label -> (file extension, MIME type)
+FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'CSV (gzip)': ('.csv.gz', 'application/gzip'),
+}
+if pq is not None:
+    FORMATS['Parquet'] = ('.parquet', 'application/vnd.apache.parquet')
+
+# Where full raw extracts are written, one file per dataset version and format
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'maryland_crime_exports')
+
+RAW_CHUNK_BYTES = 8 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+# Serialized page exports shared by every session
+export_cache = LRUCache(max_entries=64, max_bytes=EXPORT_CACHE_MAX_BYTES, sizeof=len)
+
+def to_bytes(df, fmt):
+    """
+    Serialize a frame in one of the export formats.
+    :param df: DataFrame to export.
+    :param fmt: Key of FORMATS.
+    :return: The file contents as bytes.
+    """
+    if fmt == 'CSV':
+        return df.to_csv(index=False).encode('utf-8')
+    if fmt == 'CSV (gzip)':
+        # mtime=0 keeps the output identical between runs
+        return gzip.compress(df.to_csv(index=False).encode('utf-8'), mtime=0)
+    if fmt == 'Parquet':
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    raise ValueError(f"Unknown export format: {fmt}")
+
+def cached_export(key, build_frame, fmt):
+    """
+    Serialize a page's data once per dataset version, selection and format.
+    :param key: Tuple of the export name and the widget values the data depends on.
+    :param build_frame: Callable without arguments that returns the DataFrame to export.
+    :param fmt: Key of FORMATS.
+    :return: The file contents as bytes.
+    """
+    return export_cache.get_or_create((dataset_version(),) + tuple(key) + (fmt,),
+                                      lambda: to_bytes(build_frame(), fmt))
+
+def _write_frames(frames, target, fmt):
+    """Write a stream of frames to target in one of the export formats."""
+    if fmt == 'Parquet':
+        writer = None
+        try:
+            for df in frames:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                writer = writer or pq.ParquetWriter(target, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return
+    if fmt not in ('CSV', 'CSV (gzip)'):
+        raise ValueError(f"Unknown export format: {fmt}")
+    opener = gzip.open if fmt == 'CSV (gzip)' else open
+    with opener(target, 'wt', newline='', encoding='utf-8') as f:
+        for i, df in enumerate(frames):
+            df.to_csv(f, header=i == 0, index=False)
+
+def _write_raw(source, target, fmt):
+    """Stream the source CSV or store into target without loading it whole."""
+    storage = open_storage(source)
+    if storage is not None:
+        _write_frames(storage.iter_frames(), target, fmt)
+    elif fmt == 'CSV (gzip)':
+        with open(source, 'rb') as src, gzip.open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, RAW_CHUNK_BYTES)
+    elif fmt == 'Parquet':
+        reader = pa_csv.open_csv(source, read_options=pa_csv.ReadOptions(block_size=RAW_CHUNK_BYTES))
+        with pq.ParquetWriter(target, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+def raw_extract_path(fmt, filepath=None):
+    """
+    Path of the full raw extract of the dataset in a format, writing it on first use.
+    Plain CSV is served straight from a CSV source file. Other formats, and every
+    format of a storage backend, are streamed into EXPORT_DIR once per dataset
+    version and older versions are removed.
+    :param fmt: Key of FORMATS.
+    :param filepath: Path to the CSV file or store. Defaults to data_path().
+    :return: Path of the extract.
+    """
+    source = os.path.abspath(filepath or data_path())
+    if fmt == 'CSV' and open_storage(source) is None:
+        return source
+    stem = os.path.splitext(os.path.basename(source))[0]
+    target = os.path.join(EXPORT_DIR, f"{stem}-{dataset_version(source)}{FORMATS[fmt][0]}")
+    if os.path.exists(target):
+        return target
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        _write_raw(source, tmp_path, fmt)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    for stale in glob.glob(os.path.join(EXPORT_DIR, f"{glob.escape(stem)}-*{FORMATS[fmt][0]}")):
+        if stale != target:
+            os.remove(stale)
+    logger.info("Wrote %s extract of %s to %s", fmt, source, target)
+    return target
+
+def open_raw_extract(fmt, filepath=None):
+    """
+    Open the full raw extract for reading.
+    :param fmt: Key of FORMATS.
+    :param filepath: Path to the CSV file or store. Defaults to data_path().
+    :return: Binary file object positioned at the start of the extract.
+    """
+    return open(raw_extract_path(fmt, filepath), 'rb')
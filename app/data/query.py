@@ -0,0 +1,129 @@
+"""
+Indexed selections over long-format frames.
+
+The frame is sorted once by its key columns, so selecting key values or ranges is a
+binary search for the bounding row positions instead of a boolean mask over every row.
+"""
+import numpy as np
+import pandas as pd
+
+class IndexedFrame:
+    """
+    Long-format frame sorted by key columns, e.g. (Jurisdiction, Year), with O(log n) selections.
+    Selections of one contiguous block are views of the shared frame, so results must be
+    treated as read-only like everything else in the shared store.
+    """
+
+    def __init__(self, df, keys=('Jurisdiction', 'Year')):
+        """
+        :param df: DataFrame with the key columns.
+        :param keys: Key columns, outermost first.
+        """
+        self.keys = list(keys)
+        codes = []
+        self._uniques = {}
+        for key in self.keys:
+            # Every key is searched through the codes of its sorted unique values
+            key_codes, uniques = pd.factorize(np.asarray(df[key]), sort=True)
+            codes.append(key_codes.astype(np.int64))
+            self._uniques[key] = pd.Index(uniques)
+        order = np.lexsort(codes[::-1])
+        self.frame = df.take(order).reset_index(drop=True)
+
+        # Per level: a sorted search key combining the enclosing group with the key's code,
+        # the group number of every row, and the first row of each group
+        self._search, self._groups, self._group_starts = [], [], []
+        changed = np.zeros(len(order), dtype=bool)
+        groups = np.zeros(len(order), dtype=np.int64)
+        for key, key_codes in zip(self.keys, codes):
+            key_codes = key_codes[order]
+            self._search.append(groups * (len(self._uniques[key]) + 1) + key_codes + 1)
+            changed[1:] |= key_codes[1:] != key_codes[:-1]
+            groups = np.cumsum(changed)
+            self._groups.append(groups)
+            self._group_starts.append(np.concatenate([[0], np.flatnonzero(changed), [len(order)]]))
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def nbytes(self):
+        """Memory held by the frame and its index in bytes."""
+        return int(self.frame.memory_usage(deep=True).sum()) + \
+            sum(array.nbytes for array in self._search + self._groups + self._group_starts)
+
+    def _encode(self, key, criterion):
+        """Translate a criterion on key values into sorted codes or an inclusive (low, high) code range."""
+        uniques = self._uniques[key]
+        if isinstance(criterion, slice):
+            low = 0 if criterion.start is None else uniques.searchsorted(criterion.start, 'left')
+            high = len(uniques) - 1 if criterion.stop is None else uniques.searchsorted(criterion.stop, 'right') - 1
+            return low, high
+        values = [criterion] if np.ndim(criterion) == 0 else list(criterion)
+        values = uniques.get_indexer(values)
+        return np.unique(values[values >= 0])
+
+    def positions(self, **criteria):
+        """
+        Row positions of the frame matching every criterion.
+        :param criteria: Key column -> scalar, list of values, or slice(low, high) with both ends inclusive.
+        :return: Sorted numpy array of row positions, or a slice when they are contiguous.
+        """
+        unknown = set(criteria) - set(self.keys)
+        if unknown:
+            raise KeyError(f"Not an index key: {', '.join(sorted(unknown))}")
+        if len(self.frame) == 0:
+            return slice(0, 0)
+        # Blocks of rows that share every key up to the current level
+        starts, stops = np.array([0]), np.array([len(self.frame)])
+        last = max((self.keys.index(key) for key in criteria), default=-1)
+        for level, key in enumerate(self.keys[:last + 1]):
+            criterion = self._encode(key, criteria[key]) if key in criteria else None
+            if criterion is not None:
+                search = self._search[level]
+                base = (self._groups[level - 1][starts] if level else np.zeros(len(starts), dtype=np.int64)) * \
+                    (len(self._uniques[key]) + 1) + 1
+                if isinstance(criterion, tuple):
+                    low, high = base + criterion[0], base + criterion[1]
+                else:
+                    low = high = (base[:, None] + criterion[None, :]).ravel()
+                starts, stops = np.searchsorted(search, low, 'left'), np.searchsorted(search, high, 'right')
+                keep = stops > starts
+                starts, stops = starts[keep], stops[keep]
+            if level < last and (criterion is None or isinstance(criterion, tuple)):
+                # Split into one block per value so the next key is sorted within each block
+                groups, group_starts = self._groups[level], self._group_starts[level]
+                first = groups[starts]
+                counts = groups[stops - 1] - first + 1
+                ids = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+                starts, stops = group_starts[ids], group_starts[ids + 1]
+        if len(starts) == 1:
+            return slice(int(starts[0]), int(stops[0]))
+        lengths = stops - starts
+        # Vectorized concatenation of the ranges [start, stop)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return np.arange(lengths.sum()) + offsets
+
+    def select(self, columns=None, **criteria):
+        """
+        Rows matching every criterion, in key order.
+        :param columns: Optional list of columns to return besides the keys.
+        :param criteria: Key column -> scalar, list of values, or slice(low, high) with both ends inclusive.
+        :return: DataFrame.
+        """
+        rows = self.positions(**criteria)
+        result = self.frame.iloc[rows]
+        if columns is not None:
+            result = result[self.keys + [column for column in columns if column not in self.keys]]
+        return result
+
+    def aggregate(self, by, columns, how='sum', **criteria):
+        """
+        Group the matching rows and aggregate columns.
+        :param by: Column or list of columns to group by.
+        :param columns: Columns to aggregate.
+        :param how: Aggregation accepted by DataFrameGroupBy.agg, e.g. 'sum' or 'mean'.
+        :param criteria: Key column -> scalar, list of values, or slice(low, high) with both ends inclusive.
+        :return: DataFrame indexed by the group keys.
+        """
+        return self.select(columns, **criteria).groupby(by, observed=True)[list(columns)].agg(how)
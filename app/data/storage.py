@@ -0,0 +1,210 @@
+"""
+Storage backends the data loader can read instead of a flat CSV.
+
+A backend holds preprocessed crime rows and answers filtered reads and grouped totals
+itself, so callers pull only the rows or aggregates they need. The data loader picks a
+backend from the file extension of the dataset path, see STORAGE_BACKENDS.
+
+Build a SQLite store from the bundled CSV with:
+
+    python -m app.data.storage app/data/cleaned_MD_Crime_Data.csv crime.sqlite
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+from urllib.request import pathname2url
+import pandas as pd
+
+TABLE = 'crime'
+
+# Rows read per chunk when streaming a store
+CHUNK_ROWS = 200_000
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+class SQLiteStorage:
+    """
+    Crime rows in one SQLite table indexed on (Jurisdiction, Year).
+    Every call opens its own connection, so any number of threads, sessions and
+    Streamlit worker processes can read the same file. Reads are read-only; appends
+    take SQLite's write lock for the length of one transaction.
+    """
+
+    def __init__(self, path, schema=None, keys=('Jurisdiction', 'Year')):
+        """
+        :param path: Path of the SQLite file.
+        :param schema: Optional mapping of column to dtype applied to every frame read.
+        :param keys: Key columns the table is indexed on, outermost first.
+        """
+        self.path = os.path.abspath(path)
+        self.schema = schema or {}
+        self.keys = list(keys)
+
+    @contextlib.contextmanager
+    def connect(self, readonly=True):
+        """Open a connection, committing on success when writable, and always close it."""
+        if readonly and not os.path.exists(self.path):
+            raise FileNotFoundError(self.path)
+        uri = f"file:{pathname2url(self.path)}{'?mode=ro' if readonly else ''}"
+        connection = sqlite3.connect(uri, uri=True, timeout=30)
+        try:
+            yield connection
+            if not readonly:
+                connection.commit()
+        finally:
+            connection.close()
+
+    def columns(self):
+        """
+        Columns of the table in order.
+        :return: Dictionary of column name to declared SQLite type, e.g. 'INTEGER' or 'REAL'.
+        """
+        with self.connect() as connection:
+            rows = connection.execute(f"PRAGMA table_info({_quote(TABLE)})").fetchall()
+        return {name: declared.upper() for _, name, declared, *_ in rows}
+
+    def _where(self, jurisdictions=None, years=None):
+        """SQL filter and parameters for a jurisdiction list and an inclusive (start, end) year range."""
+        clauses, params = [], []
+        if jurisdictions is not None:
+            jurisdictions = list(jurisdictions)
+            clauses.append(f"{_quote(self.keys[0])} IN ({', '.join('?' * len(jurisdictions))})")
+            params.extend(str(j) for j in jurisdictions)
+        if years is not None:
+            start, end = years
+            if start is not None:
+                clauses.append(f"{_quote(self.keys[1])} >= ?")
+                params.append(int(start))
+            if end is not None:
+                clauses.append(f"{_quote(self.keys[1])} <= ?")
+                params.append(int(end))
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ''), params
+
+    def _typed(self, df):
+        return df.astype({column: dtype for column, dtype in self.schema.items() if column in df.columns})
+
+    def read_frame(self, columns=None, jurisdictions=None, years=None):
+        """
+        Read matching rows in (Jurisdiction, Year) order.
+        :param columns: Optional list of columns besides the keys. Defaults to every column.
+        :param jurisdictions: Optional list of jurisdictions to keep.
+        :param years: Optional inclusive (start, end) year range; either end may be None.
+        :return: DataFrame with the schema's dtypes applied.
+        """
+        frames = list(self.iter_frames(CHUNK_ROWS, columns, jurisdictions, years))
+        if not frames:
+            return self._typed(pd.DataFrame(columns=self.keys + list(columns) if columns else list(self.columns())))
+        return pd.concat(frames, ignore_index=True)
+
+    def iter_frames(self, chunksize=CHUNK_ROWS, columns=None, jurisdictions=None, years=None):
+        """
+        Stream matching rows in (Jurisdiction, Year) order, chunksize rows at a time.
+        Arguments are the same as read_frame.
+        :return: Generator of DataFrames.
+        """
+        if columns:
+            columns = self.keys + [column for column in columns if column not in self.keys]
+        selected = ', '.join(_quote(column) for column in columns) if columns else '*'
+        where, params = self._where(jurisdictions, years)
+        order = ', '.join(_quote(key) for key in self.keys)
+        sql = f"SELECT {selected} FROM {_quote(TABLE)}{where} ORDER BY {order}"
+        with self.connect() as connection:
+            for chunk in pd.read_sql_query(sql, connection, params=params, chunksize=chunksize):
+                yield self._typed(chunk)
+
+    def totals(self, metrics, by=None, jurisdictions=None, years=None):
+        """
+        Sum metrics per group inside SQLite.
+        :param metrics: Columns to sum.
+        :param by: Columns to group by. Defaults to the key columns.
+        :param jurisdictions: Optional list of jurisdictions to keep.
+        :param years: Optional inclusive (start, end) year range; either end may be None.
+        :return: Tuple of (DataFrame of sums indexed by the group columns, Series of row counts).
+        """
+        by = list(by or self.keys)
+        groups = ', '.join(_quote(column) for column in by)
+        sums = ', '.join(f"SUM({_quote(metric)})" for metric in metrics)
+        where, params = self._where(jurisdictions, years)
+        sql = f"SELECT {groups}, COUNT(*), {sums} FROM {_quote(TABLE)}{where} GROUP BY {groups}"
+        with self.connect() as connection:
+            rows = connection.execute(sql, params).fetchall()
+        result = pd.DataFrame(rows, columns=by + ['Rows'] + list(metrics)).set_index(by)
+        return result[list(metrics)], result['Rows']
+
+    def medians(self, columns):
+        """
+        Median of each column over every row inside SQLite, skipping NULLs like pandas does.
+        :param columns: Numeric columns.
+        :return: Series of medians indexed by column, NaN for a column without values.
+        """
+        medians = {}
+        with self.connect() as connection:
+            for column in columns:
+                quoted = _quote(column)
+                count, = connection.execute(f"SELECT COUNT({quoted}) FROM {_quote(TABLE)}").fetchone()
+                # The middle value, or the two middle values of an even count
+                middle = connection.execute(
+                    f"SELECT {quoted} FROM {_quote(TABLE)} WHERE {quoted} IS NOT NULL "
+                    f"ORDER BY {quoted} LIMIT ? OFFSET ?", (2 - count % 2, (count - 1) // 2)).fetchall()
+                medians[column] = sum(value for value, in middle) / len(middle) if count else float('nan')
+        return pd.Series(medians, dtype='float64')
+
+    def write(self, frames):
+        """
+        Replace the store with the rows of frames and index it.
+        The file is built next to the target and moved into place, so readers never see a partial store.
+        :param frames: Iterable of DataFrames with the same columns.
+        :return: Number of rows written.
+        """
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        rows = 0
+        try:
+            with contextlib.closing(sqlite3.connect(tmp_path)) as connection:
+                # The file is not visible to readers until it is complete, so durability can wait
+                connection.execute("PRAGMA synchronous = OFF")
+                connection.execute("PRAGMA journal_mode = OFF")
+                for df in frames:
+                    self._insert(connection, df)
+                    rows += len(df)
+                keys = ', '.join(_quote(key) for key in self.keys)
+                connection.execute(f"CREATE INDEX {_quote(TABLE + '_keys')} ON {_quote(TABLE)} ({keys})")
+                connection.execute(f"CREATE INDEX {_quote(TABLE + '_year')} ON {_quote(TABLE)} ({_quote(self.keys[1])})")
+                connection.execute("ANALYZE")
+                connection.commit()
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return rows
+
+    def append(self, df):
+        """
+        Insert rows in one transaction.
+        :param df: DataFrame with the table's columns.
+        """
+        with self.connect(readonly=False) as connection:
+            self._insert(connection, df[list(self.columns())])
+
+    def _insert(self, connection, df):
+        # Categories are stored as their labels
+        df = df.astype({column: str for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+        df.to_sql(TABLE, connection, if_exists='append', index=False, chunksize=50_000)
+
+def main(argv=None):
+    from app.data.data_loader import build_store
+
+    parser = argparse.ArgumentParser(description="Build a SQLite store from a crime CSV.")
+    parser.add_argument('csv', help="Cleaned crime CSV to load")
+    parser.add_argument('store', help="SQLite file to write, e.g. crime.sqlite")
+    args = parser.parse_args(argv)
+    rows = build_store(args.csv, args.store)
+    print(f"Wrote {rows} rows to {args.store}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
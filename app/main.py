@@ -5,7 +5,8 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 import streamlit as st
-from app.components import navigation, introduction, trend_analysis, crime_distribution, geographical_analysis, population_correlation, crime_hotspots, crime_rate_changes
+from app.components import navigation
+from app import profiling
 from app.config import APP_TITLE, SIDEBAR_TITLE
 
 # Set the page configuration as the first Streamlit command
@@ -23,21 +24,14 @@ local_css("assets/styles.css")
 def main():
     st.sidebar.title(SIDEBAR_TITLE)
     choice = navigation.sidebar()
-
-    if choice == "Introduction":
-        introduction.show()
-    elif choice == "Trend Analysis":
-        trend_analysis.show()
-    elif choice == "Crime Distribution":
-        crime_distribution.show()
-    elif choice == "Geographical Analysis":
-        geographical_analysis.show()
-    elif choice == "Population Correlation":
-        population_correlation.show()
-    elif choice == "Crime Hotspots":
-        crime_hotspots.show()
-    elif choice == "Crime Rate Changes":
-        crime_rate_changes.show()
+    profiling.start_run(choice)
+    with profiling.stage('import'):
+        page = navigation.load_page(choice)
+    page.show()
+    # Imported here so the export machinery loads after the page, not before every page
+    from app.components.downloads import raw_extract_buttons
+    raw_extract_buttons()
+    profiling.finish_run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import streamlit as st
+
+# Set to 1 to profile every run, or open the app with ?profile=1
+PROFILE_ENV = 'MARYLAND_CRIME_PROFILE'
+PROFILE_QUERY_PARAM = 'profile'
+
+logger = logging.getLogger('app.timing')
+
+# Streamlit runs each session's script on its own thread
+_local = threading.local()
+
+def enabled():
+    """
+    Whether stage timing is switched on for the current run.
+    :return: True if MARYLAND_CRIME_PROFILE or the profile query parameter is set to 1.
+    """
+    if os.environ.get(PROFILE_ENV) == '1':
+        return True
+    try:
+        return st.query_params.get(PROFILE_QUERY_PARAM) == '1'
+    except Exception:  # Outside a Streamlit run there are no query parameters
+        return False
+
+def start_run(page):
+    """
+    Begin collecting timings for one script run.
+    :param page: Page label the run belongs to.
+    """
+    _local.run = {'page': page, 'id': uuid.uuid4().hex, 'timings': []} if enabled() else None
+    if _local.run is not None and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+@contextmanager
+def stage(name):
+    """
+    Time a stage of the current run, e.g. 'load', 'aggregate', 'charts' or 'export'.
+    Does nothing unless profiling is enabled for the run.
+    :param name: Stage name. Repeated stages are added up.
+    """
+    run = getattr(_local, 'run', None)
+    if run is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run['timings'].append((name, time.perf_counter() - start))
+
+def breakdown():
+    """
+    Total time per stage of the current run, in first-seen order.
+    :return: Dictionary of stage name to seconds, empty when profiling is off.
+    """
+    run = getattr(_local, 'run', None)
+    totals = {}
+    for name, seconds in run['timings'] if run else []:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return totals
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else None
+    except ImportError:
+        return None
+
+def finish_run():
+    """Show the stage breakdown in the sidebar and log one JSON record per stage."""
+    run = getattr(_local, 'run', None)
+    if run is None:
+        return
+    totals = breakdown()
+    session = _session_id()
+    for name, seconds in totals.items():
+        logger.info(json.dumps({'event': 'stage_timing', 'page': run['page'], 'stage': name,
+                                'ms': round(seconds * 1000, 3), 'run': run['id'], 'session': session}))
+
+    st.sidebar.subheader("Timings")
+    st.sidebar.table({'Stage': list(totals) + ['Total'],
+                      'ms': [f"{seconds * 1000:.1f}" for seconds in totals.values()] +
+                            [f"{sum(totals.values()) * 1000:.1f}"]})
+    _local.run = None
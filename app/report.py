@@ -0,0 +1,147 @@
+"""
+Render every dashboard page to a static HTML bundle without Streamlit.
+
+    maryland-crime-report --output report
+
+Each page module that defines report(cube) is built in its own worker process.
+The bundle contains index.html, one HTML file per page and a local copy of
+plotly.js. Altair charts load Vega from its CDN when the report is opened.
+"""
+import argparse
+import html
+import importlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+from app.components.navigation import PAGES
+from app.config import APP_TITLE
+from app.data.data_loader import get_cube
+
+VEGA_SCRIPTS = [
+    'https://cdn.jsdelivr.net/npm/vega@5',
+    'https://cdn.jsdelivr.net/npm/vega-lite@5',
+    'https://cdn.jsdelivr.net/npm/vega-embed@6',
+]
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="plotly.min.js"></script>
+{vega}
+<style>
+body {{ font-family: sans-serif; margin: 2rem auto; max-width: 1200px; }}
+table {{ border-collapse: collapse; font-size: 0.9rem; }}
+th, td {{ border: 1px solid #ddd; padding: 0.25rem 0.5rem; text-align: right; }}
+</style>
+</head>
+<body>
+<p><a href="index.html">&larr; All pages</a></p>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+def slug(label):
+    """File name stem of a page, e.g. 'crime-hotspots' for 'Crime Hotspots'."""
+    return re.sub(r'[^a-z0-9]+', '-', label.lower()).strip('-')
+
+def render_item(item, element_id):
+    """
+    Render one report item to HTML.
+    :param item: Plotly figure, Altair chart, DataFrame or text.
+    :param element_id: Unique id for the chart container.
+    :return: HTML fragment.
+    """
+    if hasattr(item, 'to_plotly_json'):
+        return item.to_html(full_html=False, include_plotlyjs=False, div_id=element_id)
+    if hasattr(item, 'to_dict') and hasattr(item, 'mark_line'):  # Altair chart
+        spec = json.dumps(item.to_dict())
+        return f'<div id="{element_id}"></div><script>vegaEmbed("#{element_id}", {spec});</script>'
+    if isinstance(item, pd.DataFrame):
+        return item.to_html(index=False, float_format=lambda value: f'{value:,.2f}', na_rep='', border=0)
+    return f'<p>{html.escape(str(item))}</p>'
+
+def build_page(label, filepath=None):
+    """
+    Run a page's aggregations and render its sections.
+    :param label: Page label from the page registry.
+    :param filepath: Optional path of the dataset to report on.
+    :return: Tuple of (label, page HTML or None if the page has no report, seconds taken).
+    """
+    start = time.perf_counter()
+    module = importlib.import_module(PAGES[label])
+    if not hasattr(module, 'report'):
+        return label, None, time.perf_counter() - start
+    sections = module.report(get_cube(filepath))
+    body = []
+    uses_vega = False
+    for i, (heading, item) in enumerate(sections):
+        uses_vega = uses_vega or hasattr(item, 'mark_line')
+        body.append(f'<h2>{html.escape(heading)}</h2>\n{render_item(item, f"{slug(label)}-{i}")}')
+    vega = '\n'.join(f'<script src="{src}"></script>' for src in VEGA_SCRIPTS) if uses_vega else ''
+    page = PAGE_TEMPLATE.format(title=html.escape(label), vega=vega, body='\n'.join(body))
+    return label, page, time.perf_counter() - start
+
+def write_report(output, filepath=None, workers=None, pages=None):
+    """
+    Build every page in parallel and write the HTML bundle.
+    :param output: Directory to write to. It is created if missing.
+    :param filepath: Optional path of the dataset to report on.
+    :param workers: Number of worker processes. None uses one per page up to the number of CPUs, 1 builds in this process.
+    :param pages: Optional list of page labels. Defaults to every page in the registry.
+    :return: Dictionary of page label to seconds taken, for the pages that were written.
+    """
+    import plotly.offline
+
+    labels = list(pages or PAGES)
+    os.makedirs(output, exist_ok=True)
+    workers = workers or min(len(labels), os.cpu_count() or 1)
+    if workers == 1:
+        results = [build_page(label, filepath) for label in labels]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(build_page, labels, [filepath] * len(labels)))
+
+    with open(os.path.join(output, 'plotly.min.js'), 'w', encoding='utf-8') as f:
+        f.write(plotly.offline.get_plotlyjs())
+    timings = {}
+    links = []
+    for label, page, seconds in results:
+        if page is None:
+            continue
+        with open(os.path.join(output, f'{slug(label)}.html'), 'w', encoding='utf-8') as f:
+            f.write(page)
+        timings[label] = seconds
+        links.append(f'<li><a href="{slug(label)}.html">{html.escape(label)}</a></li>')
+    index = PAGE_TEMPLATE.format(title=html.escape(APP_TITLE), vega='',
+                                 body=f'<p>Generated {time.strftime("%Y-%m-%d %H:%M")}</p>\n<ul>\n' +
+                                      '\n'.join(links) + '\n</ul>')
+    with open(os.path.join(output, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(index.replace('<p><a href="index.html">&larr; All pages</a></p>\n', ''))
+    return timings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render every dashboard page to a static HTML report.")
+    parser.add_argument('--output', default='report', help="Directory to write the report to")
+    parser.add_argument('--data', help="Dataset to report on. Defaults to MARYLAND_CRIME_DATA or the bundled CSV")
+    parser.add_argument('--workers', type=int, help="Worker processes. Defaults to one per page up to the CPU count")
+    parser.add_argument('--pages', help="Comma-separated page labels to include. Defaults to every page")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    pages = [label.strip() for label in args.pages.split(',')] if args.pages else None
+    timings = write_report(args.output, args.data, args.workers, pages)
+    for label, seconds in timings.items():
+        print(f"{label:<26} {seconds * 1000:8.1f} ms")
+    print(f"Wrote {len(timings)} pages to {args.output} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
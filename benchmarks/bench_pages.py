@@ -0,0 +1,374 @@
+"""
+Headless benchmarks for every dashboard page.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pages --scales 1,10,100 --json bench.json
+
+For each dataset scale the bundled CSV is replicated (extra jurisdictions, a longer
+span of years, or extra rows per jurisdiction-year to mimic agency-level extracts) and
+every page is measured in three ways:
+
+* load: CSV parse and preprocessing, Parquet sidecar read, cube build, and the cube
+  summed inside a SQLite store
+* aggregate / charts: the page's prepare_* and create_* functions with typical widget
+  states, with chart specs serialized the way Streamlit does before sending them
+* render / rerun: the full show() through Streamlit's AppTest, first run and after
+  one widget interaction
+* fragment: the same interaction rerunning only the st.fragment section that holds the
+  widget, the way the browser requests it; compare with rerun for the before/after.
+  This replays reruns through Streamlit's script runner internals and is skipped with a
+  message on versions that lack them
+
+Each measurement reports the best wall time over --repeat runs and the tracemalloc
+peak of one extra run. With --compare, the run fails when a wall time regresses by
+more than --tolerance against a previous --json output.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import patch
+
+import pandas as pd
+import plotly.io as pio
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+# The fragment stage drives script runner internals last checked against Streamlit 1.65
+try:
+    from streamlit.runtime.scriptrunner_utils.script_requests import RerunData, ScriptRequests
+    FRAGMENT_RERUNS = (hasattr(LocalScriptRunner, 'request_rerun')
+                       and 'fragment_id_queue' in {f.name for f in dataclasses.fields(RerunData)})
+except ImportError:
+    FRAGMENT_RERUNS = False
+
+from app.components import (crime_distribution, crime_hotspots, crime_rate_changes, geographical_analysis,
+                            navigation, population_correlation, reduction_forecast, trend_analysis)
+from app.data import data_loader
+from app.data.cube import build_cube
+
+def _trend_aggregate(cube):
+    crime_rates = trend_analysis.prepare_overall_trend(data_loader.derived_metrics(cube))
+    trend_analysis.prepare_jurisdiction_trends(cube, cube.years.min(), cube.years.max())
+    return crime_rates, trend_analysis.prepare_specific_trends(cube, ['MurderPer100k', 'RobberyPer100k'])
+
+def _trend_charts(data):
+    crime_rates, specific_crime_rates = data
+    return [trend_analysis.create_overall_chart(crime_rates),
+            trend_analysis.create_specific_chart(specific_crime_rates),
+            trend_analysis.create_yoy_chart(crime_rates)]
+
+def _distribution_aggregate(cube):
+    selected = crime_distribution.CRIME_TYPES_ABSOLUTE[:3]
+    derived = data_loader.derived_metrics(cube)
+    crime_data, crime_data_melted = crime_distribution.prepare_distribution(derived, selected)
+    crime_distribution.summarize_distribution(derived, selected)
+    return crime_data_melted, derived.changes(selected)
+
+def _distribution_charts(data):
+    crime_data_melted, crime_data_pct_change = data
+    return [crime_distribution.create_stacked_area_chart(crime_data_melted),
+            crime_distribution.create_line_chart(crime_data_pct_change)]
+
+def _geographical_aggregate(cube):
+    avg_crime_rates, state_avg_crime_rate = geographical_analysis.prepare_jurisdiction_rates(cube)
+    geographical_analysis.prepare_spatial_clusters(avg_crime_rates)
+    return avg_crime_rates, state_avg_crime_rate
+
+def _geographical_charts(data):
+    return [geographical_analysis.create_rate_bar_chart(*data),
+            geographical_analysis.create_rate_scatter(*data)]
+
+def _correlation_aggregate(cube):
+    avg_data = population_correlation.prepare_averages(cube)
+    fits = population_correlation.prepare_fits(avg_data)
+    uncertainty = population_correlation.prepare_uncertainty(avg_data)
+    return (avg_data, fits, population_correlation.prepare_correlations(fits, uncertainty),
+            population_correlation.prepare_yearly_correlations(cube))
+
+def _correlation_charts(data):
+    avg_data, fits, correlation_df, yearly_correlations = data
+    selected_crime = population_correlation.CRIME_TYPES[0]
+    return [population_correlation.create_correlation_chart(correlation_df),
+            population_correlation.create_yearly_correlation_chart(yearly_correlations),
+            population_correlation.create_scatter_grid(avg_data, fits),
+            population_correlation.create_regression_chart(avg_data, selected_crime, fits.loc[selected_crime])]
+
+def _hotspots_aggregate(cube):
+    total_crime_per_jurisdiction, avg_crime_rate = crime_hotspots.prepare_hotspots(cube)
+    top_jurisdictions = total_crime_per_jurisdiction['Jurisdiction'].head(10).tolist()
+    return (total_crime_per_jurisdiction, avg_crime_rate,
+            crime_hotspots.prepare_breakdown(cube, top_jurisdictions),
+            crime_hotspots.prepare_trend(cube, top_jurisdictions[:5]),
+            crime_hotspots.prepare_rolling_hotspots(cube, 5),
+            crime_hotspots.prepare_spatial_statistics(cube))
+
+def _hotspots_charts(data):
+    total_crime_per_jurisdiction, avg_crime_rate, crime_breakdown_pct, trend_data, rolling, spatial = data
+    rates, hotspots, average, _ = rolling
+    year = rates.columns.max()
+    metric = crime_hotspots.SPATIAL_METRICS[0]
+    year_statistics = spatial.select(Metric=metric, Year=year).dropna(subset=['GiZ'])
+    return [crime_hotspots.create_hotspot_chart(total_crime_per_jurisdiction, avg_crime_rate),
+            crime_hotspots.create_breakdown_heatmap(crime_breakdown_pct),
+            crime_hotspots.create_trend_chart(trend_data),
+            crime_hotspots.create_year_hotspot_chart(crime_hotspots.prepare_year_hotspots(rates, hotspots, year),
+                                                     average[year], year, 5),
+            crime_hotspots.create_gi_chart(year_statistics, metric, year)]
+
+def _rate_changes_aggregate(cube):
+    crime_data_pct_change = data_loader.derived_metrics(cube).changes(crime_rate_changes.CRIME_TYPES)
+    return crime_data_pct_change[crime_data_pct_change['Crime Type'].isin(crime_rate_changes.CRIME_TYPES[:2])]
+
+def _rate_changes_charts(data):
+    return [crime_rate_changes.create_line_chart(data)]
+
+def _forecast_aggregate(cube):
+    history, projections = reduction_forecast.prepare_forecast(cube, reduction_forecast.METRICS[0])
+    reduction_forecast.prepare_summary(projections)
+    return history, projections
+
+def _forecast_charts(data):
+    history, projections = data
+    return [reduction_forecast.create_forecast_chart(history, projections, reduction_forecast.STATEWIDE,
+                                                     reduction_forecast.METRICS[0])]
+
+# Page label -> (aggregation with typical widget states, chart construction)
+SCENARIOS = {
+    "Trend Analysis": (_trend_aggregate, _trend_charts),
+    "Crime Distribution": (_distribution_aggregate, _distribution_charts),
+    "Geographical Analysis": (_geographical_aggregate, _geographical_charts),
+    "Population Correlation": (_correlation_aggregate, _correlation_charts),
+    "Crime Hotspots": (_hotspots_aggregate, _hotspots_charts),
+    "Crime Rate Changes": (_rate_changes_aggregate, _rate_changes_charts),
+    "Crime Reduction Forecast": (_forecast_aggregate, _forecast_charts),
+}
+
+# Page label -> widget change applied before the measured rerun, returning the changed widget
+INTERACTIONS = {
+    "Trend Analysis": lambda at: at.multiselect[0].set_value(trend_analysis.CRIME_TYPES),
+    "Crime Distribution": lambda at: at.radio[0].set_value("Rates per 100,000 Population"),
+    "Population Correlation": lambda at: at.selectbox[0].set_value(population_correlation.CRIME_TYPES[-1]),
+    "Crime Hotspots": lambda at: at.slider[0].set_value(20),
+    "Crime Rate Changes": lambda at: at.multiselect[0].set_value(crime_rate_changes.CRIME_TYPES),
+    "Crime Reduction Forecast": lambda at: at.selectbox[1].set_value("Baltimore County"),
+}
+
+PAGE_SCRIPT = """
+from app.components import navigation
+navigation.load_page({label!r}).show()
+"""
+
+def serialize(chart):
+    """Serialize a chart the way Streamlit does before sending it to the browser."""
+    if hasattr(chart, 'to_plotly_json'):
+        return pio.to_json(chart)
+    return json.dumps(chart.to_dict())
+
+def scale_dataset(df, factor, axis='jurisdictions'):
+    """
+    Replicate the dataset factor times.
+    :param df: Raw crime frame.
+    :param factor: Number of replicas.
+    :param axis: 'jurisdictions' adds renamed copies of every jurisdiction, 'years' extends
+        every series with copies of its years before and after the real ones, 'rows' repeats
+        every jurisdiction-year row like an agency-level extract would.
+    :return: Scaled DataFrame.
+    :raises ValueError: If the years would leave the range pandas timestamps can hold.
+    """
+    if factor == 1:
+        return df
+    if axis == 'rows':
+        return df.loc[df.index.repeat(factor)].reset_index(drop=True)
+    if axis == 'years':
+        first, last = int(df['Year'].min()), int(df['Year'].max())
+        span = last - first + 1
+        # Centred on the real years, since pages turn years into timestamps
+        offsets = [span * shift for shift in range(-((factor - 1) // 2), factor // 2 + 1)]
+        if first + offsets[0] <= pd.Timestamp.min.year or last + offsets[-1] >= pd.Timestamp.max.year:
+            raise ValueError(f"Cannot extend {span} years {factor}-fold within "
+                             f"{pd.Timestamp.min.year + 1}-{pd.Timestamp.max.year - 1}")
+        return pd.concat([df.assign(Year=df['Year'] + offset) for offset in offsets], ignore_index=True)
+    replicas = []
+    for i in range(factor):
+        replica = df.copy()
+        if i:
+            replica['Jurisdiction'] = replica['Jurisdiction'] + f' #{i}'
+        replicas.append(replica)
+    return pd.concat(replicas, ignore_index=True)
+
+def measure(fn, repeat):
+    """
+    Time a callable and record its peak traced memory.
+    :return: Tuple of (last result, best wall time in seconds, peak memory in MB).
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak / 1e6
+
+def _script_runs(messages, fragment_id=None):
+    """
+    Patch AppTest's script runner to keep the messages of every run in messages and, with a
+    fragment_id, to rerun only that fragment instead of the whole script.
+    """
+    run = LocalScriptRunner.run
+
+    def patched(self, *args, **kwargs):
+        if fragment_id is not None:
+            # Replace the full run the runner queues on creation with the fragment rerun a browser sends
+            self._requests = ScriptRequests()
+            request_rerun = self.request_rerun
+            self.request_rerun = lambda data: request_rerun(dataclasses.replace(data, fragment_id_queue=[fragment_id]))
+        tree = run(self, *args, **kwargs)
+        messages.extend(self.forward_msgs())
+        return tree
+
+    return patch.object(LocalScriptRunner, 'run', patched)
+
+def widget_fragment(messages, widget_id):
+    """
+    Fragment that holds a widget.
+    :param messages: ForwardMsgs of a full run.
+    :param widget_id: Widget ID, e.g. at.slider[0].id.
+    :return: Fragment ID, or None when the widget is outside every fragment.
+    """
+    for msg in messages:
+        if msg.WhichOneof('type') == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+            element = msg.delta.new_element
+            if getattr(getattr(element, element.WhichOneof('type')), 'id', None) == widget_id:
+                return msg.delta.fragment_id or None
+    return None
+
+def run_page(label, interact=None):
+    """
+    Run one page through AppTest, optionally applying its widget interaction and rerunning.
+    :param label: Page label.
+    :param interact: None for a single run, 'rerun' to rerun the whole page after the interaction,
+        'fragment' to rerun only the fragment holding the changed widget.
+    :return: Seconds of the rerun, or None without an interaction.
+    """
+    at = AppTest.from_string(PAGE_SCRIPT.format(label=label), default_timeout=600)
+    messages = []
+    with _script_runs(messages):
+        at.run()
+    elapsed = None
+    if interact:
+        widget = INTERACTIONS[label](at)
+        fragment_id = widget_fragment(messages, widget.id) if interact == 'fragment' else None
+        with _script_runs([], fragment_id):
+            start = time.perf_counter()
+            at.run()
+            elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"{label} failed: {at.exception[0].value}")
+    return elapsed
+
+def bench_scale(raw, factor, axis, repeat, workdir):
+    """Benchmark every stage and page on one scaled replica of the dataset."""
+    results = []
+
+    def record(page, stage, seconds, peak_mb):
+        results.append({'scale': factor, 'axis': axis, 'page': page, 'stage': stage,
+                        'ms': round(seconds * 1000, 2),
+                        'peak_mb': None if peak_mb is None else round(peak_mb, 2)})
+
+    path = os.path.join(workdir, f'crime_x{factor}_{axis}.csv')
+    scale_dataset(raw, factor, axis).to_csv(path, index=False)
+
+    df, seconds, peak = measure(lambda: data_loader.load_data(path, use_sidecar=False), repeat)
+    record('(load)', 'csv', seconds, peak)
+    data_loader.load_data(path)  # Writes the sidecar
+    _, seconds, peak = measure(lambda: data_loader.load_data(path), repeat)
+    record('(load)', 'sidecar', seconds, peak)
+    cube, seconds, peak = measure(lambda: build_cube(df), repeat)
+    record('(load)', 'cube', seconds, peak)
+    store = os.path.join(workdir, f'crime_x{factor}_{axis}.sqlite')
+    data_loader.build_store(path, store)
+    _, seconds, peak = measure(lambda: data_loader.storage_cube(data_loader.open_storage(store)), repeat)
+    record('(load)', 'sqlite', seconds, peak)
+
+    for label, (aggregate, charts) in SCENARIOS.items():
+        data, seconds, peak = measure(lambda: aggregate(cube), repeat)
+        record(label, 'aggregate', seconds, peak)
+        _, seconds, peak = measure(lambda: [serialize(chart) for chart in charts(data)], repeat)
+        record(label, 'charts', seconds, peak)
+
+    os.environ[data_loader.DATA_PATH_ENV] = path
+    try:
+        data_loader.clear_cache()
+        data_loader.get_cube()  # Warm the shared store like a running server would be
+        for label in navigation.PAGES:
+            _, seconds, peak = measure(lambda: run_page(label), repeat)
+            record(label, 'render', seconds, peak)
+            if label in INTERACTIONS:
+                for interact in ('rerun', 'fragment') if FRAGMENT_RERUNS else ('rerun',):
+                    seconds = min(run_page(label, interact) for _ in range(repeat))
+                    record(label, interact, seconds, None)
+    finally:
+        del os.environ[data_loader.DATA_PATH_ENV]
+        data_loader.clear_cache()
+    return results
+
+def compare(results, baseline_path, tolerance):
+    """Return the measurements that are slower than the baseline by more than tolerance."""
+    with open(baseline_path) as f:
+        baseline = {(r['scale'], r['axis'], r['page'], r['stage']): r['ms'] for r in json.load(f)}
+    regressions = []
+    for r in results:
+        before = baseline.get((r['scale'], r['axis'], r['page'], r['stage']))
+        if before and r['ms'] > before * (1 + tolerance):
+            regressions.append({**r, 'baseline_ms': before})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every dashboard page headlessly.")
+    parser.add_argument('--scales', default='1,10,100', help="Comma-separated replication factors, e.g. 1,10,100,1000")
+    parser.add_argument('--axis', choices=['jurisdictions', 'years', 'rows'], default='jurisdictions',
+                        help="Replicate jurisdictions, extend the years (up to about 11-fold) "
+                             "or replicate rows per jurisdiction-year")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the best time is reported")
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--compare', help="Fail on regressions against a previous --json output")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown for --compare")
+    args = parser.parse_args(argv)
+
+    if not FRAGMENT_RERUNS:
+        print("Skipping the fragment stage: this Streamlit version lacks the script runner "
+              "internals it replays fragment reruns through (checked against 1.65)")
+    raw = pd.read_csv(data_loader.DEFAULT_DATA_PATH)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for factor in (int(scale) for scale in args.scales.split(',')):
+            scale_results = bench_scale(raw, factor, args.axis, args.repeat, workdir)
+            for r in scale_results:
+                peak = '-' if r['peak_mb'] is None else f"{r['peak_mb']:.1f}"
+                print(f"x{r['scale']:<5} {r['page']:<24} {r['stage']:<10} {r['ms']:>10.1f} ms {peak:>9} MB")
+            results.extend(scale_results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION x{r['scale']} {r['page']} {r['stage']}: {r['baseline_ms']} ms -> {r['ms']} ms")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
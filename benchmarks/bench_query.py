@@ -0,0 +1,89 @@
+"""
+Benchmark indexed selections against boolean masks over the raw frame.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_query --scales 1,10,100,1000
+
+For each scale the preprocessed dataset is replicated the same way bench_pages does and
+typical page selections are timed twice: as the boolean masks the pages used to build
+(df[df['Jurisdiction'].isin(...)], df[df['Year'] == year]) and through IndexedFrame.
+Both must return the same rows.
+"""
+import argparse
+import json
+import sys
+import time
+
+import pandas as pd
+
+from app.data import data_loader
+from app.data.query import IndexedFrame
+from benchmarks.bench_pages import scale_dataset
+
+def selections(df):
+    """Selections to time, as (name, mask function, index criteria)."""
+    jurisdictions = sorted(df['Jurisdiction'].astype(str).unique())
+    top = jurisdictions[:5]
+    year = int(df['Year'].median())
+    start, end = year - 10, year
+    return [
+        ('top jurisdictions', lambda: df[df['Jurisdiction'].isin(top)], {'Jurisdiction': top}),
+        ('one jurisdiction', lambda: df[df['Jurisdiction'] == top[0]], {'Jurisdiction': top[0]}),
+        ('one year', lambda: df[df['Year'] == year], {'Year': year}),
+        ('year range', lambda: df[df['Year'].between(start, end)], {'Year': slice(start, end)}),
+        ('jurisdictions x years', lambda: df[df['Jurisdiction'].isin(top) & df['Year'].between(start, end)],
+         {'Jurisdiction': top, 'Year': slice(start, end)}),
+    ]
+
+def best_time(fn, repeat):
+    """Best wall time of fn over repeat runs, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_scale(df, factor, repeat):
+    """Time every selection on one scaled replica of the dataset."""
+    scaled = data_loader.preprocess_data(scale_dataset(df, factor))
+    start = time.perf_counter()
+    index = IndexedFrame(scaled)
+    build_seconds = time.perf_counter() - start
+    results = [{'scale': factor, 'rows': len(scaled), 'selection': '(build index)', 'mask_ms': None,
+                'index_ms': round(build_seconds * 1000, 3), 'speedup': None}]
+    for name, mask, criteria in selections(scaled):
+        expected = mask().sort_values(['Jurisdiction', 'Year'], kind='stable').reset_index(drop=True)
+        pd.testing.assert_frame_equal(index.select(**criteria).reset_index(drop=True), expected)
+        mask_seconds = best_time(mask, repeat)
+        index_seconds = best_time(lambda: index.select(**criteria), repeat)
+        results.append({'scale': factor, 'rows': len(scaled), 'selection': name,
+                        'mask_ms': round(mask_seconds * 1000, 3), 'index_ms': round(index_seconds * 1000, 3),
+                        'speedup': round(mask_seconds / index_seconds, 1)})
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark indexed selections against boolean masks.")
+    parser.add_argument('--scales', default='1,10,100', help="Comma-separated replication factors, e.g. 1,10,100,1000")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs per measurement; the best time is reported")
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    raw = pd.read_csv(data_loader.DEFAULT_DATA_PATH)
+    results = []
+    for factor in (int(scale) for scale in args.scales.split(',')):
+        for r in bench_scale(raw, factor, args.repeat):
+            mask_ms = '-' if r['mask_ms'] is None else f"{r['mask_ms']:.3f}"
+            speedup = '' if r['speedup'] is None else f"{r['speedup']:>7.1f}x"
+            print(f"x{r['scale']:<5} {r['rows']:>9} rows {r['selection']:<22} "
+                  f"mask {mask_ms:>9} ms  index {r['index_ms']:>9.3f} ms {speedup}")
+            results.append(r)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,16 +7,25 @@ setup(
     include_package_data=True,
     install_requires=[
         'streamlit',
+        'numpy',
         'pandas',
+        'scipy',
+        'statsmodels',
         'seaborn',
         'matplotlib',
         'altair',
         'plotly',
         'unittest'
     ],
+    extras_require={
+        # Parquet sidecar and exports
+        'parquet': ['pyarrow'],
+    },
     entry_points={
         'console_scripts': [
             'maryland-crime-analysis=app.main:main',
+            'maryland-crime-report=app.report:main',
+            'maryland-crime-api=app.api:main',
         ],
     },
     author='Your Name',